@@ -1,5 +1,13 @@
+import datetime
+
 from django.contrib import admin
-from .models import Category, Article, ArticleImage, Tool, Resource
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from . import analytics
+from .models import Category, Article, ArticleImage, Tool, Resource, Job, LinkPreview, ViewStat, Image, ImageUsage
 
 # Inline image management for Articles
 class ArticleImageInline(admin.TabularInline):
@@ -56,3 +64,97 @@ class ResourceAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     list_filter = ('category',)
     ordering = ('name',)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'updated_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('created_at', 'updated_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(LinkPreview)
+class LinkPreviewAdmin(admin.ModelAdmin):
+    list_display = ('url', 'title', 'status_code', 'fetched_at', 'expires_at')
+    list_filter = ('status_code',)
+    search_fields = ('url', 'title')
+    readonly_fields = ('fetched_at', 'expires_at', 'etag', 'last_modified', 'error')
+
+
+class ImageUsageInline(admin.TabularInline):
+    model = ImageUsage
+    fields = ('article', 'source')
+    readonly_fields = ('article', 'source')
+    extra = 0
+    can_delete = False
+
+
+@admin.register(Image)
+class ImageAdmin(admin.ModelAdmin):
+    list_display = ('url', 'is_broken', 'status_code', 'checked_at', 'usage_count')
+    list_filter = ('is_broken', 'status_code')
+    search_fields = ('url',)
+    readonly_fields = ('url', 'status_code', 'error', 'is_broken', 'checked_at')
+    inlines = [ImageUsageInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(usage_count=Count('usages'))
+
+    @admin.display(ordering='usage_count', description='Usages')
+    def usage_count(self, obj):
+        return obj.usage_count
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ViewStat)
+class ViewStatAdmin(admin.ModelAdmin):
+    """The changelist is replaced by a dashboard of the most viewed content"""
+    # Label, number of days or months including the current one, row period
+    PERIODS = {
+        '7d': ('Last 7 days', 7, ViewStat.PERIOD_DAY),
+        '30d': ('Last 30 days', 30, ViewStat.PERIOD_DAY),
+        '90d': ('Last 90 days', 90, ViewStat.PERIOD_DAY),
+        '12m': ('Last 12 months', 12, ViewStat.PERIOD_MONTH),
+    }
+
+    @staticmethod
+    def since(count, granularity, today):
+        """First day of the last ``count`` days, or of the last ``count`` calendar months"""
+        if granularity == ViewStat.PERIOD_MONTH:
+            index = today.year * 12 + today.month - count
+            return datetime.date(index // 12, index % 12 + 1, 1)
+        return today - datetime.timedelta(days=count - 1)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        period = request.GET.get('period', '7d')
+        if period not in self.PERIODS:
+            period = '7d'
+        _, count, granularity = self.PERIODS[period]
+        since = self.since(count, granularity, timezone.localdate())
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'View analytics',
+            'period': period,
+            'period_choices': [(key, label) for key, (label, _, _) in self.PERIODS.items()],
+            'sections': [
+                ('Top articles', analytics.top(ViewStat.DIMENSION_ARTICLE, since, granularity)),
+                ('Top categories', analytics.top(ViewStat.DIMENSION_CATEGORY, since, granularity)),
+                ('Top tags', analytics.top(ViewStat.DIMENSION_TAG, since, granularity)),
+            ],
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/core/viewstat/dashboard.html', context)
@@ -0,0 +1,170 @@
+"""
+Per-day view analytics.
+
+``record_view`` counts a view of an article, its category and its tags in a
+process-local buffer that is flushed into ``ViewStat`` day rows with one
+batched upsert, instead of a write per hit. The category and tags come from
+the article the page already loaded, so neither counting nor rolling up
+reads the articles or tags tables. Views still buffered when a process exits
+are lost, at most ``ANALYTICS_FLUSH_INTERVAL`` seconds worth per worker.
+
+``rollup`` derives the weekly and monthly rows from the day rows;
+``apply_retention`` drops old rows. The admin dashboard reads only
+``ViewStat``.
+"""
+import datetime
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .models import ViewStat
+
+logger = logging.getLogger(__name__)
+
+_buffer = {}
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def dimensions(article):
+    """
+    ``(dimension, object_id, label)`` of ``article``, its category and its
+    tags. Uses the loaded category and prefetched tags without querying.
+    """
+    rows = [(ViewStat.DIMENSION_ARTICLE, article.pk, article.title)]
+    if article.category_id:
+        rows.append((ViewStat.DIMENSION_CATEGORY, article.category_id, article.category.name))
+    rows.extend((ViewStat.DIMENSION_TAG, tag.pk, tag.name) for tag in article.tags.all())
+    return rows
+
+
+def record_view(rows):
+    """Count one view today of each ``(dimension, object_id, label)``, see ``dimensions``"""
+    global _last_flush
+    day = timezone.localdate()
+    with _lock:
+        for dimension, object_id, label in rows:
+            entry = _buffer.setdefault((dimension, object_id, day), [0, label])
+            entry[0] += 1
+        due = (
+            len(_buffer) >= settings.ANALYTICS_FLUSH_SIZE
+            or time.monotonic() - _last_flush >= settings.ANALYTICS_FLUSH_INTERVAL
+        )
+    if due:
+        flush()
+
+
+def flush():
+    """Write buffered views to the database. Returns the number of rows upserted"""
+    global _buffer, _last_flush
+    with _lock:
+        pending, _buffer = _buffer, {}
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+
+    rows = [
+        (dimension, object_id, label, ViewStat.PERIOD_DAY, day, views)
+        for (dimension, object_id, day), (views, label) in pending.items()
+    ]
+    try:
+        upsert(rows, increment=True)
+    except Exception:
+        logger.exception("Dropped %s buffered view counts", len(rows))
+        return 0
+    return len(rows)
+
+
+def upsert(rows, increment=False):
+    """
+    Insert ``(dimension, object_id, label, period, period_start, views)`` rows,
+    adding to (``increment``) or replacing the views of existing ones.
+    Uses INSERT ... ON CONFLICT, available on SQLite and PostgreSQL.
+    """
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    table = qn(ViewStat._meta.db_table)
+    views = f"{table}.{qn('views')} + excluded.{qn('views')}" if increment else f"excluded.{qn('views')}"
+    sql = (
+        f"INSERT INTO {table} ({qn('dimension')}, {qn('object_id')}, {qn('label')}, {qn('period')}, "
+        f"{qn('period_start')}, {qn('views')}) VALUES (%s, %s, %s, %s, %s, %s) "
+        f"ON CONFLICT ({qn('dimension')}, {qn('period')}, {qn('period_start')}, {qn('object_id')}) "
+        f"DO UPDATE SET {qn('views')} = {views}, {qn('label')} = excluded.{qn('label')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (dimension, object_id, label[:200], period, day.isoformat(), count)
+            for dimension, object_id, label, period, day, count in rows
+        ])
+
+
+def period_bounds(period, day):
+    """First day of the week (Monday) or month containing ``day``, and the first day after it"""
+    if period == ViewStat.PERIOD_WEEK:
+        start = day - datetime.timedelta(days=day.weekday())
+        return start, start + datetime.timedelta(days=7)
+    start = day.replace(day=1)
+    return start, (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _latest_label(**filters):
+    """The label of the newest row of the outer row's object, so renames show their new name"""
+    return Subquery(
+        ViewStat.objects.filter(object_id=OuterRef('object_id'), **filters)
+        .order_by('-period_start').values('label')[:1]
+    )
+
+
+def _rollup_period(period, day):
+    """Recompute the week or month rows of every dimension for the period containing ``day``"""
+    start, end = period_bounds(period, day)
+    totals = (
+        ViewStat.objects.filter(period=ViewStat.PERIOD_DAY, period_start__gte=start, period_start__lt=end)
+        .values('dimension', 'object_id')
+        .annotate(
+            total=Sum('views'),
+            last_label=_latest_label(
+                dimension=OuterRef('dimension'), period=ViewStat.PERIOD_DAY, period_start__lt=end,
+            ),
+        )
+        .order_by()
+    )
+    upsert([
+        (row['dimension'], row['object_id'], row['last_label'], period, start, row['total'])
+        for row in totals
+    ])
+
+
+def apply_retention(today=None):
+    """Delete rows older than ``ANALYTICS_RETENTION_DAYS`` for their period"""
+    today = today or timezone.localdate()
+    retention = settings.ANALYTICS_RETENTION_DAYS
+    deleted = 0
+    for period, days in retention.items():
+        if days:
+            cutoff = today - datetime.timedelta(days=days)
+            deleted += ViewStat.objects.filter(period=period, period_start__lt=cutoff).delete()[0]
+    return deleted
+
+
+def rollup(day):
+    """Build every derived row for ``day``. Safe to run repeatedly for the same day"""
+    flush()
+    _rollup_period(ViewStat.PERIOD_WEEK, day)
+    _rollup_period(ViewStat.PERIOD_MONTH, day)
+
+
+def top(dimension, since, period=ViewStat.PERIOD_DAY, limit=10):
+    """Most viewed objects of a dimension in rows starting on or after ``since``"""
+    return list(
+        ViewStat.objects.filter(dimension=dimension, period=period, period_start__gte=since)
+        .values('object_id')
+        .annotate(total=Sum('views'), last_label=_latest_label(dimension=dimension, period=period))
+        .order_by('-total')[:limit]
+    )
@@ -0,0 +1,343 @@
+"""
+Read-only JSON API (``/api/v1/``) for articles, categories, tags, tools and
+resources.
+
+- Lists are paginated with opaque cursors over a stable ordering, so deep
+  pages cost the same as the first one. ``limit`` picks the page size.
+- ``fields=a,b`` picks the returned fields. Only the columns and relations
+  those fields need are loaded. List defaults leave out article content.
+- Every response has an ETag. A matching ``If-None-Match`` gets a 304, and
+  responses carry the same surrogate keys as the HTML pages, so the
+  front-end cache can keep them until the content changes.
+"""
+import base64
+import hashlib
+import json
+from dataclasses import dataclass
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
+from taggit.models import Tag
+
+from . import object_cache
+from .models import Article, Category, Resource, Tool
+from .query_budget import query_budget
+from .surrogate import add_surrogate_keys, cache_policy, category_key, list_key, object_key, tag_key
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    status = 400
+
+
+@dataclass(frozen=True)
+class Field:
+    """How to read one field, and what has to be loaded for it"""
+    get: object
+    columns: tuple = ()
+    select: tuple = ()
+    prefetch: tuple = ()
+
+
+def _url(name):
+    return lambda obj, request: request.build_absolute_uri(reverse(name, args=[obj.slug]))
+
+
+def _category(obj, request):
+    category = obj.category
+    return {'name': category.name, 'slug': category.slug} if category else None
+
+
+CATEGORY_FIELD = Field(_category, ('category',), select=('category',))
+
+
+class Endpoint:
+    """A model exposed as ``/api/v1/<name>/`` and ``/api/v1/<name>/<slug>/``"""
+
+    def __init__(self, model, ordering, fields, list_fields, detail_fields):
+        self.model = model
+        self.ordering = ordering
+        self.fields = fields
+        self.list_fields = list_fields
+        self.detail_fields = detail_fields
+
+    def parse_fields(self, request, default):
+        value = request.GET.get('fields')
+        if not value:
+            return default
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown field(s) {', '.join(unknown)}; available: {', '.join(self.fields)}")
+        return names
+
+    def queryset(self, names, only=True):
+        """
+        The joins and prefetches the chosen fields need and, with ``only``,
+        just their columns (so article lists never load content).
+        """
+        fields = [self.fields[name] for name in names]
+        columns = {'slug', *(field for field, _ in self._order_fields())}
+        select, prefetch = set(), set()
+        for field in fields:
+            columns.update(field.columns)
+            select.update(field.select)
+            prefetch.update(field.prefetch)
+        queryset = self.model.objects.select_related(*select).prefetch_related(*prefetch)
+        if only:
+            queryset = queryset.only(*columns, *(f"{relation}__{column}" for relation in select for column in ('name', 'slug')))
+        return queryset
+
+    def serialize(self, obj, names, request):
+        return {name: self.fields[name].get(obj, request) for name in names}
+
+    # Cursor pagination
+
+    def _order_fields(self):
+        """``(field name, descending)`` for each ordering column, ending with the id"""
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = [self.model._meta.get_field(name).value_to_string(obj) for name, _ in self._order_fields()]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def after_cursor(self, queryset, cursor):
+        """Rows strictly after the cursor in the endpoint's ordering"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            order = self._order_fields()
+            if len(values) != len(order):
+                raise ValueError
+            values = [self.model._meta.get_field(name).to_python(value) for (name, _), value in zip(order, values)]
+        except Exception:
+            raise ApiError("Invalid cursor")
+        condition = Q()
+        for index, (name, descending) in enumerate(reversed(order)):
+            position = len(order) - 1 - index
+            lookup = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[position]})
+            condition = lookup if index == 0 else lookup | (Q(**{name: values[position]}) & condition)
+        return queryset.filter(condition)
+
+
+def _tags(obj, request):
+    return [{'name': tag.name, 'slug': tag.slug} for tag in obj.tags.all()]
+
+
+def _images(obj, request):
+    return [{'url': image.image_url, 'is_banner': image.is_banner} for image in obj.images.all()]
+
+
+ARTICLES = Endpoint(
+    Article, ordering=['-published_at', '-id'],
+    fields={
+        'slug': Field(lambda obj, request: obj.slug),
+        'title': Field(lambda obj, request: obj.title, ('title',)),
+        'url': Field(_url('article_detail')),
+        'category': CATEGORY_FIELD,
+        'tags': Field(_tags, prefetch=('tags',)),
+        'images': Field(_images, prefetch=('images',)),
+        'read_time': Field(lambda obj, request: obj.read_time, ('read_time',)),
+        'is_tutorial': Field(lambda obj, request: obj.is_tutorial, ('is_tutorial',)),
+        'is_featured': Field(lambda obj, request: obj.is_featured, ('is_featured',)),
+        'views': Field(lambda obj, request: obj.views, ('views',)),
+        'published_at': Field(lambda obj, request: obj.published_at, ('published_at',)),
+        'updated_at': Field(lambda obj, request: obj.updated_at, ('updated_at',)),
+        'content': Field(lambda obj, request: obj.rendered_content or obj.content, ('content', 'rendered_content')),
+    },
+    list_fields=['slug', 'title', 'url', 'category', 'tags', 'images', 'read_time', 'is_tutorial', 'published_at'],
+    detail_fields=['slug', 'title', 'url', 'category', 'tags', 'images', 'read_time', 'is_tutorial',
+                   'published_at', 'updated_at', 'content'],
+)
+
+_TOOL_FIELDS = {
+    'slug': Field(lambda obj, request: obj.slug),
+    'name': Field(lambda obj, request: obj.name, ('name',)),
+    'description': Field(lambda obj, request: obj.description, ('description',)),
+    'category': CATEGORY_FIELD,
+    'external_link': Field(lambda obj, request: obj.external_link, ('external_link',)),
+    'updated_at': Field(lambda obj, request: obj.updated_at, ('updated_at',)),
+}
+
+TOOLS = Endpoint(
+    Tool, ordering=['name', 'id'],
+    fields={**_TOOL_FIELDS, 'url': Field(_url('tool_detail'))},
+    list_fields=['slug', 'name', 'url', 'category', 'external_link'],
+    detail_fields=['slug', 'name', 'url', 'category', 'description', 'external_link', 'updated_at'],
+)
+
+RESOURCES = Endpoint(
+    Resource, ordering=['name', 'id'],
+    fields={
+        **_TOOL_FIELDS,
+        'url': Field(_url('resource_detail')),
+        'file_url': Field(lambda obj, request: obj.file_url, ('file_url',)),
+    },
+    list_fields=['slug', 'name', 'url', 'category', 'file_url', 'external_link'],
+    detail_fields=['slug', 'name', 'url', 'category', 'description', 'file_url', 'external_link', 'updated_at'],
+)
+
+CATEGORIES = Endpoint(
+    Category, ordering=['name', 'id'],
+    fields={
+        'slug': Field(lambda obj, request: obj.slug),
+        'name': Field(lambda obj, request: obj.name, ('name',)),
+        'url': Field(_url('articles_by_category')),
+        'description': Field(lambda obj, request: obj.description, ('description',)),
+    },
+    list_fields=['slug', 'name', 'url'],
+    detail_fields=['slug', 'name', 'url', 'description'],
+)
+
+TAGS = Endpoint(
+    Tag, ordering=['name', 'id'],
+    fields={
+        'slug': Field(lambda obj, request: obj.slug),
+        'name': Field(lambda obj, request: obj.name, ('name',)),
+        'url': Field(_url('articles_by_tag')),
+    },
+    list_fields=['slug', 'name', 'url'],
+    detail_fields=['slug', 'name', 'url'],
+)
+
+
+# Responses
+
+def _json_response(request, data, keys):
+    """JSON with a content ETag; a matching If-None-Match gets a 304"""
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    etag = '"%s"' % hashlib.md5(body.encode(), usedforsecurity=False).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(data, encoder=DjangoJSONEncoder, json_dumps_params={'separators': (',', ':')})
+    response['ETag'] = etag
+    return add_surrogate_keys(response, *keys)
+
+
+def api_view(max_queries):
+    """GET only, cacheable, query-budgeted, with API errors returned as JSON"""
+    def decorator(view):
+        @require_GET
+        @cache_policy(max_age=60, s_maxage=600)
+        @query_budget(max_queries=max_queries, max_db_ms=200)
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as exc:
+                return JsonResponse({'error': str(exc)}, status=exc.status)
+            except Http404:
+                return JsonResponse({'error': 'Not found'}, status=404)
+        return wrapper
+    return decorator
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError("limit must be an integer")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _list(request, endpoint, filters=None):
+    """
+    One page of ``endpoint``. ``filters(request, queryset)`` may narrow the
+    queryset and returns it with the surrogate keys of the narrowed listing.
+    """
+    names = endpoint.parse_fields(request, endpoint.list_fields)
+    limit = _limit(request)
+    queryset = endpoint.queryset(names).order_by(*endpoint.ordering)
+    keys = []
+    if filters is not None:
+        queryset, keys = filters(request, queryset)
+    if request.GET.get('cursor'):
+        queryset = endpoint.after_cursor(queryset, request.GET['cursor'])
+    rows = list(queryset[:limit + 1])
+    page, more = rows[:limit], len(rows) > limit
+
+    next_url = None
+    if more:
+        params = request.GET.copy()
+        params['cursor'] = endpoint.encode_cursor(page[-1])
+        next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    data = {'results': [endpoint.serialize(obj, names, request) for obj in page], 'next': next_url}
+    return _json_response(request, data, [list_key(endpoint.model), *keys, *(object_key(obj) for obj in page)])
+
+
+def _detail(request, endpoint, slug):
+    names = endpoint.parse_fields(request, endpoint.detail_fields)
+    # Full rows: the object cache shares objects with the HTML detail pages
+    obj = object_cache.get_object_or_404(endpoint.queryset(endpoint.fields, only=False), slug=slug)
+    return _json_response(request, endpoint.serialize(obj, names, request), [object_key(obj)])
+
+
+# Views
+
+def _filter_articles(request, queryset):
+    """``?category=<slug>`` and ``?tag=<slug>``"""
+    keys = []
+    if request.GET.get('category'):
+        category = object_cache.get_object_or_404(Category.objects.all(), slug=request.GET['category'])
+        queryset = queryset.filter(category=category)
+        keys.append(category_key(Article, category.pk))
+    if request.GET.get('tag'):
+        queryset = queryset.filter(tags__slug=request.GET['tag'])
+        keys.append(tag_key(request.GET['tag']))
+    return queryset, keys
+
+
+@api_view(max_queries=4)
+def article_list(request):
+    return _list(request, ARTICLES, _filter_articles)
+
+
+@api_view(max_queries=4)
+def article_detail(request, slug):
+    return _detail(request, ARTICLES, slug)
+
+
+@api_view(max_queries=2)
+def tool_list(request):
+    return _list(request, TOOLS)
+
+
+@api_view(max_queries=2)
+def tool_detail(request, slug):
+    return _detail(request, TOOLS, slug)
+
+
+@api_view(max_queries=2)
+def resource_list(request):
+    return _list(request, RESOURCES)
+
+
+@api_view(max_queries=2)
+def resource_detail(request, slug):
+    return _detail(request, RESOURCES, slug)
+
+
+@api_view(max_queries=1)
+def category_list(request):
+    return _list(request, CATEGORIES)
+
+
+@api_view(max_queries=1)
+def category_detail(request, slug):
+    return _detail(request, CATEGORIES, slug)
+
+
+@api_view(max_queries=1)
+def tag_list(request):
+    return _list(request, TAGS)
+
+
+@api_view(max_queries=1)
+def tag_detail(request, slug):
+    return _detail(request, TAGS, slug)
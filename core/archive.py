@@ -0,0 +1,55 @@
+"""
+Month counts for the article archive.
+
+``ArchiveMonth`` rows are adjusted incrementally from the Article signals in
+``core/signals.py``; ``rebuild`` recomputes them from scratch.
+"""
+import datetime
+
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Article, ArchiveMonth
+
+
+def month_of(published_at):
+    local = timezone.localtime(published_at) if timezone.is_aware(published_at) else published_at
+    return local.year, local.month
+
+
+def month_range(year, month=None):
+    """Aware [start, end) datetimes of a year or a single month"""
+    if month is None:
+        start, end = datetime.datetime(year, 1, 1), datetime.datetime(year + 1, 1, 1)
+    else:
+        start = datetime.datetime(year, month, 1)
+        end = datetime.datetime(year + (month == 12), month % 12 + 1, 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def adjust(published_at, delta):
+    """Add ``delta`` to the count of the month ``published_at`` falls in"""
+    if published_at is None:
+        return
+    year, month = month_of(published_at)
+    row, _ = ArchiveMonth.objects.get_or_create(year=year, month=month)
+    rows = ArchiveMonth.objects.filter(pk=row.pk)
+    if delta < 0:
+        rows = rows.filter(count__gte=-delta)
+    rows.update(count=F('count') + delta)
+
+
+def rebuild():
+    """Recompute every month count from the articles table"""
+    totals = (
+        Article.objects.annotate(month=TruncMonth('published_at'))
+        .values('month')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+    ArchiveMonth.objects.all().delete()
+    ArchiveMonth.objects.bulk_create(
+        ArchiveMonth(year=row['month'].year, month=row['month'].month, count=row['total'])
+        for row in totals
+    )
@@ -0,0 +1,183 @@
+"""
+Save-time rendering of article content.
+
+``render_content`` turns ``Article.content`` into the HTML stored in
+``Article.rendered_content``: Markdown is converted once (this needs the
+``markdown`` package; without it only paragraphs and line breaks are kept and
+a warning is logged), then every transform in ``settings.CONTENT_TRANSFORMS``
+rewrites the parsed HTML in turn. A transform is a callable ``(soup, article)`` that edits the
+BeautifulSoup tree in place.
+"""
+import functools
+import logging
+import re
+import struct
+
+from django.conf import settings
+from django.utils.html import linebreaks
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+HTML_BLOCK_RE = re.compile(r'<(p|div|h[1-6]|ul|ol|table|pre|blockquote|section|article|figure|img|br)\b', re.IGNORECASE)
+
+
+@functools.cache
+def _warn_markdown_missing():
+    logger.warning("The markdown package is not installed: Markdown content is shown as plain paragraphs")
+
+
+def to_html(text):
+    """Content written as Markdown (no block-level HTML) is converted to HTML"""
+    if not text or HTML_BLOCK_RE.search(text):
+        return text or ''
+    try:
+        import markdown
+    except ImportError:
+        _warn_markdown_missing()
+        return linebreaks(text)
+    return markdown.markdown(text, extensions=['fenced_code', 'tables'])
+
+
+def content_image_urls(article):
+    """``src`` of every image in the content, as written (before any transform)"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(to_html(article.content), 'html.parser')
+    return [img['src'] for img in soup.find_all('img') if img.get('src')]
+
+
+def gallery_images(rendered_html, urls):
+    """
+    ``{'src', 'url', 'width', 'height'}`` of every content image for the
+    article's gallery: the source, size and resized URL come from the rendered
+    HTML, ``url`` is the source as written (see ``content_image_urls``)
+    """
+    from bs4 import BeautifulSoup
+
+    images = [img for img in BeautifulSoup(rendered_html, 'html.parser').find_all('img') if img.get('src')]
+    return [
+        {'src': img['src'], 'url': url, 'width': img.get('width', ''), 'height': img.get('height', '')}
+        for img, url in zip(images, urls)
+    ]
+
+
+def render_content(article):
+    from bs4 import BeautifulSoup
+
+    html = to_html(article.content)
+    transforms = settings.CONTENT_TRANSFORMS
+    if not transforms:
+        return html
+    soup = BeautifulSoup(html, 'html.parser')
+    for path in transforms:
+        import_string(path)(soup, article)
+    return str(soup)
+
+
+# Transforms
+
+def lazy_load_images(soup, article):
+    """Images below the first ``CONTENT_EAGER_IMAGES`` load lazily; all decode off the main thread"""
+    eager = settings.CONTENT_EAGER_IMAGES
+    for index, img in enumerate(soup.find_all('img')):
+        img['decoding'] = 'async'
+        if index >= eager and not img.get('loading'):
+            img['loading'] = 'lazy'
+
+
+def add_image_dimensions(soup, article):
+    """Set width/height from probed sizes so the browser reserves space before loading"""
+    from .models import ImageSize
+
+    images = [img for img in soup.find_all('img') if img.get('src') and not (img.get('width') and img.get('height'))]
+    if not images:
+        return
+    sizes = {
+        size.url: size
+        for size in ImageSize.objects.filter(url__in={img['src'] for img in images}, width__isnull=False)
+    }
+    for img in images:
+        size = sizes.get(img['src'])
+        if size is not None:
+            img['width'] = str(size.width)
+            img['height'] = str(size.height)
+
+
+def resize_images(soup, article):
+    """
+    Point images at a resized variant using ``CONTENT_IMAGE_RESIZE_URL``, a
+    format string with ``{url}`` and ``{width}``. Does nothing when unset.
+    """
+    template = settings.CONTENT_IMAGE_RESIZE_URL
+    if not template:
+        return
+    max_width = settings.CONTENT_IMAGE_MAX_WIDTH
+    for img in soup.find_all('img'):
+        src = img.get('src')
+        if not src or not src.startswith(('http://', 'https://')):
+            continue
+        width = min(int(img['width']), max_width) if str(img.get('width', '')).isdigit() else max_width
+        img['src'] = template.format(url=src, width=width)
+        if img.get('width') and img.get('height') and int(img['width']) > width:
+            img['height'] = str(round(int(img['height']) * width / int(img['width'])))
+            img['width'] = str(width)
+
+
+# Image size probing
+
+def parse_image_size(data):
+    """(width, height) from the first bytes of a PNG, GIF, JPEG or WebP file, or None"""
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP' and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+        return None
+    if data[:2] == b'\xff\xd8':
+        offset = 2
+        while offset + 9 <= len(data):
+            if data[offset] != 0xFF:
+                return None
+            marker = data[offset + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                offset += 2
+                continue
+            length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+            # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + length
+    return None
+
+
+def probe_image_size(url, session=None):
+    """Fetch the start of an image and return its (width, height), or None"""
+    import requests
+
+    http = session or requests
+    try:
+        response = http.get(url, headers={'Range': 'bytes=0-65535'}, timeout=10, stream=True)
+        try:
+            if response.status_code not in (200, 206):
+                return None
+            data = b''
+            for chunk in response.iter_content(16 * 1024):
+                data += chunk
+                if len(data) >= 65536:
+                    break
+        finally:
+            response.close()
+    except requests.RequestException:
+        return None
+    return parse_image_size(data)
@@ -0,0 +1,155 @@
+"""
+Reverse index of image URLs to the articles using them.
+
+``Image`` has one row per URL with its last check result, and ``ImageUsage``
+links it to every article using it, in the content or as an ArticleImage.
+The signal handlers in ``core/signals.py`` call ``sync_article`` on save, so
+finding the articles behind a broken image, checking every image once, or
+moving images to another host never needs to parse the whole corpus.
+"""
+import html
+import re
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import object_cache
+from .content import content_image_urls
+from .models import Article, ArticleImage, Image, ImageSize, ImageUsage
+from .surrogate import list_key, object_key, purge_keys
+
+
+def _urls(values):
+    return {url[:500] for url in values if url and url.startswith(('http://', 'https://'))}
+
+
+def images_for(urls):
+    """``{url: Image}`` for ``urls``, creating the missing rows"""
+    urls = set(urls)
+    if not urls:
+        return {}
+    Image.objects.bulk_create([Image(url=url) for url in urls], ignore_conflicts=True)
+    return {image.url: image for image in Image.objects.filter(url__in=urls)}
+
+
+def sync_article(article, sources=(ImageUsage.SOURCE_CONTENT, ImageUsage.SOURCE_ATTACHED)):
+    """Bring the usage rows of ``article`` for the given sources in line with its content and images"""
+    wanted = set()
+    if ImageUsage.SOURCE_CONTENT in sources:
+        wanted |= {(url, ImageUsage.SOURCE_CONTENT) for url in _urls(content_image_urls(article))}
+    if ImageUsage.SOURCE_ATTACHED in sources:
+        attached = ArticleImage.objects.filter(article=article).values_list('image_url', flat=True)
+        wanted |= {(url, ImageUsage.SOURCE_ATTACHED) for url in _urls(attached)}
+
+    existing = {
+        (url, source): pk
+        for pk, url, source in ImageUsage.objects.filter(article=article, source__in=sources)
+        .values_list('pk', 'image__url', 'source')
+    }
+    stale = [pk for key, pk in existing.items() if key not in wanted]
+    if stale:
+        ImageUsage.objects.filter(pk__in=stale).delete()
+    new = wanted - existing.keys()
+    if new:
+        images = images_for(url for url, _ in new)
+        ImageUsage.objects.bulk_create(
+            [ImageUsage(image=images[url], article=article, source=source) for url, source in new],
+            ignore_conflicts=True,
+        )
+
+
+def articles_using(url):
+    """Articles whose content or images use ``url``"""
+    return Article.objects.filter(image_usages__image__url=url).distinct()
+
+
+def check(url, session=None):
+    """HEAD ``url``, store the result and return ``(status_code, error)``"""
+    import requests
+
+    http = session or requests
+    try:
+        status_code, error = http.head(url, timeout=5, allow_redirects=True).status_code, ''
+    except requests.RequestException as exc:
+        status_code, error = None, str(exc)
+    record_check(url, status_code, error)
+    return status_code, error
+
+
+def record_check(url, status_code=None, error=''):
+    """Store the result of checking ``url``: an HTTP status or an error message"""
+    Image.objects.filter(url=url[:500]).update(
+        status_code=status_code,
+        error=error[:300],
+        is_broken=status_code is None or status_code >= 400,
+        checked_at=timezone.now(),
+    )
+
+
+def _replace_url(text, old, new):
+    """
+    Replace ``old`` where it appears as a whole URL, not as the start of a
+    longer one, both as written and with ``&`` escaped as in HTML attributes
+    """
+    forms = {old: new, html.escape(old, quote=False): html.escape(new, quote=False)}
+    for old_form, new_form in forms.items():
+        text = re.sub(re.escape(old_form) + r'(?=["\'\s)<>]|$)', lambda match: new_form, text)
+    return text
+
+
+def rewrite(mapping):
+    """
+    Replace image URLs (``{old: new}``) in every article using them, in one
+    transaction: the content of the affected articles is updated in bulk and
+    their ArticleImage rows with one query per URL, then only the articles
+    that actually changed are re-indexed. A URL written in a form
+    ``_replace_url`` doesn't match stays indexed under the old URL.
+    Returns the number of articles changed.
+    """
+    mapping = {old: new for old, new in mapping.items() if old and new and old != new}
+    if not mapping:
+        return 0
+
+    with transaction.atomic():
+        content_urls = {}
+        for article_id, url in ImageUsage.objects.filter(
+            image__url__in=mapping, source=ImageUsage.SOURCE_CONTENT,
+        ).values_list('article_id', 'image__url'):
+            content_urls.setdefault(article_id, []).append(url)
+
+        # Moved images keep their size, so rendered content keeps its dimensions
+        known = {size.url: size for size in ImageSize.objects.filter(url__in=[*mapping, *mapping.values()])}
+        ImageSize.objects.bulk_create([
+            ImageSize(url=new, width=known[old].width, height=known[old].height)
+            for old, new in mapping.items() if old in known and new not in known
+        ], ignore_conflicts=True)
+
+        attached_ids = set(ArticleImage.objects.filter(image_url__in=mapping).values_list('article_id', flat=True))
+        for old, new in mapping.items():
+            ArticleImage.objects.filter(image_url=old).update(image_url=new)
+
+        changed = []
+        for article in Article.objects.filter(pk__in=list(content_urls)):
+            content = article.content
+            for url in content_urls[article.pk]:
+                content = _replace_url(content, url, mapping[url])
+            if content == article.content:
+                continue
+            article.content = content
+            article.render()
+            article.updated_at = timezone.now()
+            changed.append(article)
+        Article.objects.bulk_update(changed, ['content', 'first_image_url', 'rendered_content', 'content_images', 'updated_at'], batch_size=200)
+
+        for article in changed:
+            sync_article(article, sources=[ImageUsage.SOURCE_CONTENT])
+        for article_id in attached_ids:
+            sync_article(Article(pk=article_id), sources=[ImageUsage.SOURCE_ATTACHED])
+        # Old URLs still used somewhere keep their row and check result
+        Image.objects.filter(url__in=mapping, usages__isnull=True).delete()
+
+    article_ids = {article.pk for article in changed} | attached_ids
+    slugs = Article.objects.filter(pk__in=article_ids).values_list('slug', flat=True)
+    object_cache.invalidate(Article, *slugs)
+    purge_keys([list_key(Article), *(object_key(Article(pk=pk)) for pk in article_ids)])
+    return len(article_ids)
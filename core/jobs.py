@@ -0,0 +1,189 @@
+"""
+Small database-backed job queue.
+
+Jobs are rows in the ``Job`` table, so enqueueing inside a transaction only
+becomes visible once that transaction commits, and no external broker is
+needed. Workers (see the ``run_worker`` management command) claim jobs with a
+conditional UPDATE, which is atomic on SQLite as well as on server databases.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name=None):
+    """
+    Register a function as a job task.
+    The function is called with the job payload as keyword arguments.
+    """
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        _registry[task_name] = func
+        func.task_name = task_name
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    """
+    Queue a job for the worker. Safe to call from views and signal handlers.
+    ``delay`` is in seconds. Returns the created Job.
+    """
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def default_concurrency():
+    """Jobs run one at a time on SQLite, which only allows one writer at a time"""
+    return 1 if connection.vendor == 'sqlite' else settings.JOBS_CONCURRENCY
+
+
+def retry_delay(attempts):
+    """Exponential backoff in seconds for the given number of attempts made"""
+    base = settings.JOBS_RETRY_BACKOFF
+    ceiling = settings.JOBS_RETRY_BACKOFF_MAX
+    return min(base * 2 ** max(attempts - 1, 0), ceiling)
+
+
+def _claimable(now):
+    """Queued jobs that are due, plus running jobs whose visibility timeout expired"""
+    return (
+        Q(status=Job.STATUS_QUEUED, run_at__lte=now)
+        | Q(status=Job.STATUS_RUNNING, locked_until__lt=now, attempts__lt=F('max_attempts'))
+    )
+
+
+def expire_abandoned(now=None):
+    """
+    Fail running jobs whose lease expired after their last allowed attempt.
+    Returns the number of jobs marked failed.
+    """
+    now = now or timezone.now()
+    return Job.objects.filter(
+        status=Job.STATUS_RUNNING,
+        locked_until__lt=now,
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=Job.STATUS_FAILED,
+        locked_by='',
+        locked_until=None,
+        last_error='Visibility timeout expired on the final attempt.',
+        updated_at=now,
+    )
+
+
+def delete_finished(now=None):
+    """
+    Delete done and failed jobs last updated longer ago than their
+    ``JOBS_RETENTION_DAYS``. Returns the number of jobs deleted.
+    """
+    now = now or timezone.now()
+    deleted = 0
+    for status, days in settings.JOBS_RETENTION_DAYS.items():
+        if days is not None:
+            deleted += Job.objects.filter(status=status, updated_at__lt=now - timedelta(days=days)).delete()[0]
+    return deleted
+
+
+def claim(worker_id, limit=1, visibility_timeout=None):
+    """
+    Claim up to ``limit`` due jobs for ``worker_id``.
+    Each row is taken with a compare-and-set UPDATE so two workers never
+    run the same attempt. Returns the claimed Job objects.
+    """
+    now = timezone.now()
+    timeout = visibility_timeout or settings.JOBS_VISIBILITY_TIMEOUT
+    candidates = Job.objects.filter(_claimable(now)).order_by('run_at').values_list('pk', flat=True)[:limit * 2]
+
+    claimed = []
+    for pk in candidates:
+        updated = Job.objects.filter(Q(pk=pk) & _claimable(now)).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=timeout),
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if updated:
+            claimed.append(pk)
+        if len(claimed) >= limit:
+            break
+
+    return list(Job.objects.filter(pk__in=claimed, locked_by=worker_id).order_by('run_at'))
+
+
+def run_job(job):
+    """
+    Execute a claimed job and record the outcome.
+    Failed attempts are rescheduled with backoff until ``max_attempts``.
+    Returns True on success.
+    """
+    func = get_task(job.name)
+    # Only this attempt's outcome: after a visibility timeout the job may have
+    # been claimed again, even by the same worker, and the new attempt owns it
+    owned = Job.objects.filter(pk=job.pk, locked_by=job.locked_by, attempts=job.attempts, status=Job.STATUS_RUNNING)
+
+    if func is None:
+        owned.update(
+            status=Job.STATUS_FAILED,
+            locked_by='',
+            locked_until=None,
+            last_error=f"Unknown task '{job.name}'",
+            updated_at=timezone.now(),
+        )
+        logger.error("Job %s failed: unknown task %r", job.pk, job.name)
+        return False
+
+    try:
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            owned.update(
+                status=Job.STATUS_QUEUED,
+                run_at=now + timedelta(seconds=retry_delay(job.attempts)),
+                locked_by='',
+                locked_until=None,
+                last_error=error,
+                updated_at=now,
+            )
+            logger.warning("Job %s (%s) failed on attempt %s, retrying", job.pk, job.name, job.attempts)
+        else:
+            owned.update(
+                status=Job.STATUS_FAILED,
+                locked_by='',
+                locked_until=None,
+                last_error=error,
+                updated_at=now,
+            )
+            logger.error("Job %s (%s) failed permanently after %s attempts", job.pk, job.name, job.attempts)
+        return False
+
+    owned.update(
+        status=Job.STATUS_DONE,
+        locked_by='',
+        locked_until=None,
+        last_error='',
+        updated_at=timezone.now(),
+    )
+    return True
@@ -0,0 +1,205 @@
+"""
+Link previews (title, description, image, favicon) for the external URLs of
+tools and resources.
+
+``refresh`` fetches the pages concurrently over a pooled HTTP session with a
+per-host rate limit, revalidates cached entries with ETag/Last-Modified, and
+stores the results in ``LinkPreview``. Views only read that table, so the
+pages of the tools and resources whose previews changed are purged.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import LinkPreview, Tool, Resource
+from .surrogate import object_key, purge_keys
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'PezaLinkPreview/1.0'
+MAX_BODY_BYTES = 512 * 1024
+
+
+def collect_urls():
+    """Every external URL shown on tool and resource pages"""
+    urls = set()
+    urls.update(Tool.objects.exclude(external_link__isnull=True).exclude(external_link='').values_list('external_link', flat=True))
+    for external_link, file_url in Resource.objects.values_list('external_link', 'file_url'):
+        urls.update(url for url in (external_link, file_url) if url)
+    return sorted(urls)
+
+
+def pages_showing(urls):
+    """Surrogate keys of the tool and resource pages showing previews of ``urls``"""
+    tools = Tool.objects.filter(external_link__in=urls).only('pk')
+    resources = Resource.objects.filter(Q(external_link__in=urls) | Q(file_url__in=urls)).only('pk')
+    return [object_key(obj) for obj in [*tools, *resources]]
+
+
+def previews_for(*urls):
+    """Stored previews for the given URLs, in the same order, skipping unknown ones"""
+    urls = [url for url in urls if url]
+    if not urls:
+        return []
+    found = {preview.url: preview for preview in LinkPreview.objects.filter(url__in=urls)}
+    return [found[url] for url in urls if url in found and found[url].is_available]
+
+
+class HostRateLimiter:
+    """Allows at most one request per ``interval`` seconds to each host"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_allowed = {}
+
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_allowed.get(host, now))
+            self._next_allowed[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def parse_metadata(html, base_url, encoding=None):
+    """
+    Extract OpenGraph (or plain HTML) title, description, image and favicon.
+    ``html`` may be bytes, decoded with ``encoding`` when given and otherwise
+    by the document's own ``<meta charset>``.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser', from_encoding=encoding if isinstance(html, bytes) else None)
+
+    def meta(*names):
+        for name in names:
+            tag = soup.find('meta', attrs={'property': name}) or soup.find('meta', attrs={'name': name})
+            if tag and tag.get('content'):
+                return tag['content'].strip()
+        return ''
+
+    title = meta('og:title', 'twitter:title')
+    if not title and soup.title and soup.title.string:
+        title = soup.title.string.strip()
+
+    image = meta('og:image', 'twitter:image')
+    icon = soup.find('link', rel=lambda value: value and 'icon' in value.lower())
+    favicon = icon.get('href') if icon and icon.get('href') else '/favicon.ico'
+
+    return {
+        'title': title[:300],
+        'description': meta('og:description', 'description', 'twitter:description'),
+        'image_url': urljoin(base_url, image)[:500] if image else '',
+        'favicon_url': urljoin(base_url, favicon)[:500],
+    }
+
+
+def fetch(session, limiter, url, etag='', last_modified=''):
+    """
+    Fetch one URL and return a dict of LinkPreview field values.
+    A 304 response returns only the status so the stored metadata is kept.
+    """
+    headers = {'User-Agent': USER_AGENT, 'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.1'}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    limiter.wait(urlsplit(url).netloc)
+    try:
+        with session.get(url, headers=headers, timeout=settings.LINK_PREVIEW_TIMEOUT, stream=True) as response:
+            result = {'status_code': response.status_code, 'error': ''}
+            if response.status_code == 304:
+                return result
+            if response.status_code != 200:
+                result['error'] = f"HTTP {response.status_code}"
+                return result
+
+            result['etag'] = response.headers.get('ETag', '')[:200]
+            result['last_modified'] = response.headers.get('Last-Modified', '')[:100]
+            content_type = response.headers.get('Content-Type', '')
+            if 'html' not in content_type:
+                # Files such as PDFs have no metadata to show
+                return result
+
+            body = b''
+            for chunk in response.iter_content(16 * 1024):
+                body += chunk
+                if len(body) >= MAX_BODY_BYTES:
+                    break
+            # requests assumes ISO-8859-1 for text/html without a charset, so
+            # only pass one the server declared and let the page's own win otherwise
+            encoding = response.encoding if 'charset=' in content_type.lower() else None
+            result.update(parse_metadata(body, response.url, encoding))
+            return result
+    except Exception as e:
+        return {'status_code': None, 'error': str(e)[:300]}
+
+
+def _session(workers):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=1)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def refresh(urls=None, force=False, workers=None, session=None):
+    """
+    Fetch previews for ``urls`` (default: all tool and resource links) that are
+    missing or expired, or all of them with ``force``. Returns the number of
+    URLs fetched.
+    """
+    workers = workers or settings.LINK_PREVIEW_WORKERS
+    ttl = timedelta(seconds=settings.LINK_PREVIEW_TTL)
+    error_ttl = timedelta(seconds=settings.LINK_PREVIEW_ERROR_TTL)
+    limiter = HostRateLimiter(settings.LINK_PREVIEW_HOST_INTERVAL)
+    urls = collect_urls() if urls is None else list(urls)
+
+    existing = {preview.url: preview for preview in LinkPreview.objects.filter(url__in=urls)}
+    if not force:
+        now = timezone.now()
+        urls = [
+            url for url in urls
+            if url not in existing or not existing[url].expires_at or existing[url].expires_at <= now
+        ]
+    if not urls:
+        return 0
+
+    session = session or _session(workers)
+
+    def work(url):
+        preview = existing.get(url)
+        return url, fetch(
+            session, limiter, url,
+            etag=preview.etag if preview else '',
+            last_modified=preview.last_modified if preview else '',
+        )
+
+    # Threads only do network I/O; results are saved here, one at a time
+    changed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for url, result in pool.map(work, urls):
+            now = timezone.now()
+            result['fetched_at'] = now
+            result['expires_at'] = now + (error_ttl if result['error'] else ttl)
+            if result['error']:
+                logger.info("Link preview for %s failed: %s", url, result['error'])
+            LinkPreview.objects.update_or_create(url=url, defaults=result)
+            if result['status_code'] != 304:
+                changed.append(url)
+
+    if changed:
+        purge_keys(pages_showing(changed))
+    return len(urls)
@@ -0,0 +1,141 @@
+import gzip
+import json
+import sys
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+
+from core.models import Article, Tool, Resource
+
+
+def _category(obj):
+    if obj.category is None:
+        return None
+    return {'id': obj.category.pk, 'name': obj.category.name, 'slug': obj.category.slug}
+
+
+def serialize_article(article):
+    return {
+        'type': 'article',
+        'id': article.pk,
+        'title': article.title,
+        'slug': article.slug,
+        'content': article.content,
+        'category': _category(article),
+        'tags': [tag.name for tag in article.tags.all()],
+        'images': [
+            {'image_url': image.image_url, 'is_banner': image.is_banner}
+            for image in article.images.all()
+        ],
+        'read_time': article.read_time,
+        'is_tutorial': article.is_tutorial,
+        'is_featured': article.is_featured,
+        'views': article.views,
+        'published_at': article.published_at,
+        'created_at': article.created_at,
+        'updated_at': article.updated_at,
+    }
+
+
+def serialize_tool(tool):
+    return {
+        'type': 'tool',
+        'id': tool.pk,
+        'name': tool.name,
+        'slug': tool.slug,
+        'description': tool.description,
+        'category': _category(tool),
+        'external_link': tool.external_link,
+        'created_at': tool.created_at,
+        'updated_at': tool.updated_at,
+    }
+
+
+def serialize_resource(resource):
+    return {
+        'type': 'resource',
+        'id': resource.pk,
+        'name': resource.name,
+        'slug': resource.slug,
+        'description': resource.description,
+        'category': _category(resource),
+        'file_url': resource.file_url,
+        'external_link': resource.external_link,
+        'created_at': resource.created_at,
+        'updated_at': resource.updated_at,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Stream articles, tools and resources to newline-delimited JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help="Output file, '-' for stdout")
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output (implied by a .gz output file)')
+        parser.add_argument('--since', help='Only export objects updated at or after this date/datetime (ISO 8601)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows fetched from the database per query')
+        parser.add_argument(
+            '--only', action='append', choices=['articles', 'tools', 'resources'],
+            help='Export only these object types (repeatable)',
+        )
+
+    def _parse_since(self, value):
+        since = parse_datetime(value)
+        if since is None:
+            day = parse_date(value)
+            if day is None:
+                raise CommandError(f"Invalid --since value '{value}'")
+            since = datetime.combine(day, time.min)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def _open(self, output, compress):
+        """Binary output stream; gzip wraps it when compressing"""
+        raw = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        return (gzip.GzipFile(fileobj=raw, mode='wb') if compress else raw), raw
+
+    def handle(self, *args, **options):
+        since = self._parse_since(options['since']) if options['since'] else None
+        chunk_size = max(options['chunk_size'], 1)
+        only = options['only'] or ['articles', 'tools', 'resources']
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+
+        sources = {
+            'articles': (
+                Article.objects.select_related('category').prefetch_related('images', 'tags'),
+                serialize_article,
+            ),
+            'tools': (Tool.objects.select_related('category'), serialize_tool),
+            'resources': (Resource.objects.select_related('category'), serialize_resource),
+        }
+
+        stream, raw = self._open(output, compress)
+        counts = {}
+        try:
+            for name in only:
+                queryset, serialize = sources[name]
+                if since is not None:
+                    queryset = queryset.filter(updated_at__gte=since)
+                # Stable pk order keeps chunked reads cheap and exports reproducible
+                queryset = queryset.order_by('pk')
+
+                counts[name] = 0
+                for obj in queryset.iterator(chunk_size=chunk_size):
+                    line = json.dumps(serialize(obj), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+                    stream.write(line.encode('utf-8'))
+                    counts[name] += 1
+        finally:
+            if stream is not raw:
+                stream.close()
+            if output == '-':
+                raw.flush()
+            else:
+                raw.close()
+
+        summary = ', '.join(f"{count} {name}" for name, count in counts.items())
+        self.stderr.write(self.style.SUCCESS(f"Exported {summary}"))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import startup
+
+
+class Command(BaseCommand):
+    help = 'Profile a cold start: django.setup() time and the most expensive module imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--urls', action='store_true', help='Also load the URLconf and views, as the first request does')
+        parser.add_argument('--top', type=int, default=20, help='Number of imports to list')
+        parser.add_argument('--packages', action='store_true', help='List top-level packages only')
+
+    def handle(self, *args, **options):
+        profile = startup.measure(urls=options['urls'])
+
+        self.stdout.write(f"django.setup(): {profile.setup_seconds * 1000:.0f} ms")
+        if options['urls']:
+            self.stdout.write(f"with URLconf:   {profile.total_seconds * 1000:.0f} ms")
+        self.stdout.write(f"modules loaded: {len(profile.modules)}\n")
+
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>8}  module")
+        for item in profile.slowest(options['top'], top_level=options['packages']):
+            self.stdout.write(f"{item.cumulative_us / 1000:>14.1f} {item.self_us / 1000:>8.1f}  {item.name}")
+
+        budget = settings.STARTUP_TIME_BUDGET
+        if budget and profile.setup_seconds > budget:
+            self.stdout.write(self.style.WARNING(f"\nOver the {budget * 1000:.0f} ms startup budget"))
+        eager = profile.loaded(settings.STARTUP_LAZY_MODULES)
+        if eager:
+            self.stdout.write(self.style.WARNING(f"\nLoaded at startup but expected lazily: {', '.join(eager)}"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core import archive
+from core.models import ArchiveMonth
+
+
+class Command(BaseCommand):
+    help = 'Recompute the archive month counts from the articles table'
+
+    def handle(self, *args, **options):
+        archive.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {ArchiveMonth.objects.count()} archive months"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import link_previews
+
+
+class Command(BaseCommand):
+    help = 'Fetch link previews for tool and resource URLs that are missing or expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help='Only refresh these URLs')
+        parser.add_argument('--force', action='store_true', help='Refetch previews that have not expired yet')
+        parser.add_argument('--workers', type=int, default=None, help='Number of concurrent fetches')
+
+    def handle(self, *args, **options):
+        fetched = link_previews.refresh(
+            urls=options['urls'] or None,
+            force=options['force'],
+            workers=options['workers'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Fetched {fetched} link previews"))
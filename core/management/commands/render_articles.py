@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Article
+
+
+class Command(BaseCommand):
+    help = 'Re-render the stored HTML of every article, e.g. after changing CONTENT_TRANSFORMS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        count = 0
+        for article in Article.objects.order_by('pk').iterator(chunk_size=options['chunk_size']):
+            article.save(update_fields=['rendered_content'])
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rendered {count} articles"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import image_index
+from core.models import Image
+
+
+class Command(BaseCommand):
+    help = 'Replace image URLs in every article using them, e.g. after moving images to another host'
+
+    def add_arguments(self, parser):
+        parser.add_argument('old', nargs='?', help='URL to replace')
+        parser.add_argument('new', nargs='?', help='Replacement URL')
+        parser.add_argument('--from-prefix', help='Replace this URL prefix in every indexed image URL...')
+        parser.add_argument('--to-prefix', help='...with this one')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['from_prefix'] and options['to_prefix']:
+            prefix = options['from_prefix']
+            mapping = {
+                url: options['to_prefix'] + url[len(prefix):]
+                for url in Image.objects.filter(url__startswith=prefix).values_list('url', flat=True)
+            }
+        elif options['old'] and options['new']:
+            mapping = {options['old']: options['new']}
+        else:
+            raise CommandError("Give OLD NEW, or --from-prefix and --to-prefix")
+
+        for old, new in sorted(mapping.items()):
+            count = image_index.articles_using(old).count()
+            self.stdout.write(f"{old} -> {new} ({count} articles)")
+        if options['dry_run']:
+            return
+        changed = image_index.rewrite(mapping)
+        self.stdout.write(self.style.SUCCESS(f"Rewrote {len(mapping)} URLs in {changed} articles"))
@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core import analytics
+
+
+class Command(BaseCommand):
+    help = 'Roll daily view counts up into weekly and monthly stats and apply retention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Last day to roll up (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--days', type=int, default=2, help='Number of days up to --date to roll up')
+
+    def handle(self, *args, **options):
+        last_day = timezone.localdate()
+        if options['date']:
+            last_day = parse_date(options['date'])
+            if last_day is None:
+                raise CommandError(f"Invalid --date value '{options['date']}'")
+
+        for offset in reversed(range(max(options['days'], 1))):
+            day = last_day - datetime.timedelta(days=offset)
+            analytics.rollup(day)
+            self.stdout.write(f"Rolled up {day}")
+
+        deleted = analytics.apply_retention()
+        self.stdout.write(self.style.SUCCESS(f"Done, {deleted} expired rows deleted"))
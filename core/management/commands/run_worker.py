@@ -0,0 +1,61 @@
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core import jobs
+
+
+def _run_in_thread(job):
+    try:
+        return jobs.run_job(job)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None, help='Number of jobs run in parallel (default JOBS_CONCURRENCY, 1 on SQLite)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--visibility-timeout', type=int, default=None, help='Seconds before an unfinished job may be claimed again')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        concurrency = max(options['concurrency'] or jobs.default_concurrency(), 1)
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Worker {worker_id} started with concurrency {concurrency}")
+
+        running = set()
+        last_cleanup = None
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            try:
+                while True:
+                    close_old_connections()
+                    jobs.expire_abandoned()
+                    if last_cleanup is None or time.monotonic() - last_cleanup >= settings.JOBS_CLEANUP_INTERVAL:
+                        jobs.delete_finished()
+                        last_cleanup = time.monotonic()
+
+                    free = concurrency - len(running)
+                    claimed = jobs.claim(worker_id, limit=free, visibility_timeout=options['visibility_timeout']) if free else []
+                    for job in claimed:
+                        running.add(pool.submit(_run_in_thread, job))
+
+                    if running:
+                        done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                        running = set(running)
+                    elif options['once']:
+                        break
+                    else:
+                        time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping worker, waiting for running jobs...")
+                wait(running)
+
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker_id} stopped"))
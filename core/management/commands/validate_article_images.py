@@ -1,25 +1,38 @@
+import datetime
+
 from django.core.management.base import BaseCommand
-from core.models import Article
-import requests
+from django.db.models import Q
+from django.utils import timezone
+
+from core import image_index
+from core.models import Image
+
 
 class Command(BaseCommand):
-    help = 'Validate all images in article content'
+    help = 'Check the images used by articles and record which are broken'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, metavar='DAYS',
+                            help='Only check images not checked in the last DAYS days')
 
     def handle(self, *args, **options):
-        articles = Article.objects.all()
-        
-        for article in articles:
-            images = article.get_content_images()
-            
-            print(f"\nArticle: {article.title}")
-            print(f"Total images: {len(images)}")
-            
-            for img_url in images:
-                try:
-                    response = requests.head(img_url, timeout=5)
-                    if response.status_code == 200:
-                        print(f"  ✓ {img_url}")
-                    else:
-                        print(f"  ✗ {img_url} (Status: {response.status_code})")
-                except Exception as e:
-                    print(f"  ✗ {img_url} (Error: {str(e)})")
\ No newline at end of file
+        import requests
+
+        images = Image.objects.filter(usages__isnull=False).distinct()
+        if options['older_than'] is not None:
+            cutoff = timezone.now() - datetime.timedelta(days=options['older_than'])
+            images = images.filter(Q(checked_at__isnull=True) | Q(checked_at__lt=cutoff))
+
+        session = requests.Session()
+        broken = 0
+        for image in images.iterator():
+            status_code, error = image_index.check(image.url, session=session)
+            if status_code == 200:
+                self.stdout.write(f"  ✓ {image.url}")
+                continue
+            broken += 1
+            self.stdout.write(f"  ✗ {image.url} ({error or f'Status: {status_code}'})")
+            for title in image_index.articles_using(image.url).values_list('title', flat=True):
+                self.stdout.write(f"      used in: {title}")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {broken} broken images"))
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:16
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def populate_archive_months(apps, schema_editor):
+    Article = apps.get_model('core', 'Article')
+    ArchiveMonth = apps.get_model('core', 'ArchiveMonth')
+    totals = (
+        Article.objects.annotate(month=TruncMonth('published_at'))
+        .values('month')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+    ArchiveMonth.objects.bulk_create(
+        ArchiveMonth(year=row['month'].year, month=row['month'].month, count=row['total'])
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['published_at'], name='core_articl_publish_a6a48c_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='archivemonth',
+            constraint=models.UniqueConstraint(fields=('year', 'month'), name='unique_archive_month'),
+        ),
+        migrations.RunPython(populate_archive_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_archivemonth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkPreview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, unique=True)),
+                ('title', models.CharField(blank=True, max_length=300)),
+                ('description', models.TextField(blank=True)),
+                ('image_url', models.URLField(blank=True, max_length=500)),
+                ('favicon_url', models.URLField(blank=True, max_length=500)),
+                ('etag', models.CharField(blank=True, max_length=200)),
+                ('last_modified', models.CharField(blank=True, max_length=100)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=300)),
+                ('fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'ordering': ['url'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_linkpreview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('article', 'Article'), ('category', 'Category'), ('tag', 'Tag')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('label', models.CharField(blank=True, max_length=200)),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-period_start', '-views'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='viewstat',
+            constraint=models.UniqueConstraint(fields=('dimension', 'period', 'period_start', 'object_id'), name='unique_view_stat'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:24
+
+import re
+
+from django.db import migrations, models
+
+
+def extract_first_images(apps, schema_editor):
+    Article = apps.get_model('core', 'Article')
+    pattern = re.compile(r'<img[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
+    for article in Article.objects.only('pk', 'content').iterator():
+        match = pattern.search(article.content or '')
+        if match:
+            Article.objects.filter(pk=article.pk).update(first_image_url=match.group(1)[:500])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_viewstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='first_image_url',
+            field=models.URLField(blank=True, editable=False, help_text='First <img> in the content, extracted on save', max_length=500),
+        ),
+        migrations.RunPython(extract_first_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:25
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+import django.utils.timezone
+import re
+
+HTML_BLOCK_RE = re.compile(r'<(p|div|h[1-6]|ul|ol|table|pre|blockquote|section|article|figure|img|br)\b', re.IGNORECASE)
+
+
+def to_html(text):
+    """core.content.to_html as of this migration"""
+    if not text or HTML_BLOCK_RE.search(text):
+        return text or ''
+    try:
+        import markdown
+    except ImportError:
+        return linebreaks(text)
+    return markdown.markdown(text, extensions=['fenced_code', 'tables'])
+
+
+def render_existing_articles(apps, schema_editor):
+    """
+    Only converts Markdown: the CONTENT_TRANSFORMS read the current models, so
+    they are applied by ``manage.py render_articles`` after migrating
+    """
+    Article = apps.get_model('core', 'Article')
+    batch = []
+    for article in Article.objects.only('pk', 'content').iterator():
+        article.rendered_content = to_html(article.content)
+        batch.append(article)
+        if len(batch) >= 200:
+            Article.objects.bulk_update(batch, ['rendered_content'])
+            batch = []
+    Article.objects.bulk_update(batch, ['rendered_content'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_article_first_image_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageSize',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, unique=True)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('checked_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='rendered_content',
+            field=models.TextField(blank=True, editable=False, help_text='Content as served, produced on save by core/content.py'),
+        ),
+        migrations.RunPython(render_existing_articles, migrations.RunPython.noop),
+    ]
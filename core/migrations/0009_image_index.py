@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_existing_images(apps, schema_editor):
+    from core.content import content_image_urls
+
+    Article = apps.get_model('core', 'Article')
+    ArticleImage = apps.get_model('core', 'ArticleImage')
+    Image = apps.get_model('core', 'Image')
+    ImageUsage = apps.get_model('core', 'ImageUsage')
+
+    usages = set()
+    for article in Article.objects.only('pk', 'content').iterator():
+        # The same extraction as core.image_index.sync_article
+        for url in content_image_urls(article):
+            usages.add((url[:500], article.pk, 'content'))
+    for article_id, url in ArticleImage.objects.values_list('article_id', 'image_url'):
+        usages.add((url[:500], article_id, 'attached'))
+    usages = {usage for usage in usages if usage[0].startswith(('http://', 'https://'))}
+
+    Image.objects.bulk_create([Image(url=url) for url in {url for url, _, _ in usages}], ignore_conflicts=True)
+    images = dict(Image.objects.values_list('url', 'pk'))
+    ImageUsage.objects.bulk_create(
+        [ImageUsage(image_id=images[url], article_id=article_id, source=source) for url, article_id, source in usages],
+        ignore_conflicts=True,
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_article_rendered_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Image',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, unique=True)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=300)),
+                ('is_broken', models.BooleanField(blank=True, db_index=True, help_text='Unknown until checked', null=True)),
+                ('checked_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'ordering': ['url'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImageUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('content', 'Article content'), ('attached', 'Article image')], max_length=10)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_usages', to='core.article')),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usages', to='core.image')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='imageusage',
+            constraint=models.UniqueConstraint(fields=('image', 'article', 'source'), name='unique_image_usage'),
+        ),
+        migrations.RunPython(index_existing_images, migrations.RunPython.noop),
+    ]
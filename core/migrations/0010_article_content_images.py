@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_image_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='content_images',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Images of the rendered content, for the gallery'),
+        ),
+    ]
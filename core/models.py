@@ -2,7 +2,7 @@ from django.db import models
 from django.utils.text import slugify
 from taggit.managers import TaggableManager
 from django.utils import timezone
-from bs4 import BeautifulSoup
+import datetime
 import re
 
 
@@ -36,22 +36,43 @@ class Article(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     views = models.PositiveIntegerField(default=0)
     is_featured = models.BooleanField(default=False, help_text="Check to feature on homepage")
+    first_image_url = models.URLField(max_length=500, blank=True, editable=False, help_text="First <img> in the content, extracted on save")
+    rendered_content = models.TextField(blank=True, editable=False, help_text="Content as served, produced on save by core/content.py")
+    content_images = models.JSONField(default=list, blank=True, editable=False, help_text="Images of the rendered content, for the gallery")
 
     class Meta:
         ordering = ['-published_at']
+        indexes = [
+            models.Index(fields=['published_at']),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        self.render()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'first_image_url', 'rendered_content', 'content_images'}
+        elif update_fields is not None and 'rendered_content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_images'}
         super().save(*args, **kwargs)
 
+    def render(self):
+        """Fill the fields derived from the content: first image, served HTML and gallery"""
+        from .content import content_image_urls, gallery_images, render_content
+
+        urls = content_image_urls(self)
+        self.first_image_url = (urls[0] if urls else '')[:500]
+        self.rendered_content = render_content(self)
+        self.content_images = gallery_images(self.rendered_content, urls)
+
     def __str__(self):
         return self.title
 
     @property
     def banner_image(self):
-        """Get banner image from ArticleImage model"""
-        banner = self.images.filter(is_banner=True).first()
+        """Get banner image from ArticleImage model (uses prefetched images when available)"""
+        banner = next((image for image in self.images.all() if image.is_banner), None)
         return banner.image_url if banner else None
     
     # NEW METHODS FOR IMAGE EXTRACTION
@@ -65,6 +86,8 @@ class Article(models.Model):
             return []
         
         try:
+            from bs4 import BeautifulSoup
+
             soup = BeautifulSoup(self.content, 'html.parser')
             img_tags = soup.find_all('img')
             return [img.get('src') for img in img_tags if img.get('src')]
@@ -102,23 +125,22 @@ class Article(models.Model):
         if self.banner_image:
             return self.banner_image
         
-        # Fall back to first content image
-        first_img = self.get_first_content_image()
-        return first_img if first_img else None
+        # Fall back to first content image, extracted when the article was saved
+        return self.first_image_url or None
     
     def has_images(self):
         """
         Check if article has any images (banner or content)
         Returns True/False
         """
-        return bool(self.banner_image or self.get_first_content_image())
+        return bool(self.banner_image or self.first_image_url)
     
     def count_content_images(self):
         """
-        Count the number of images in content
+        Count the number of images in content, as of the last save
         Returns integer count
         """
-        return len(self.get_content_images())
+        return len(self.content_images)
     
     def get_images_with_metadata(self):
         """
@@ -129,6 +151,8 @@ class Article(models.Model):
             return []
         
         try:
+            from bs4 import BeautifulSoup
+
             soup = BeautifulSoup(self.content, 'html.parser')
             img_tags = soup.find_all('img')
             
@@ -174,6 +198,8 @@ class Article(models.Model):
             return ''
         
         try:
+            from bs4 import BeautifulSoup
+
             soup = BeautifulSoup(self.content, 'html.parser')
             text = soup.get_text()
             # Clean up whitespace
@@ -186,6 +212,44 @@ class Article(models.Model):
             return self.content[:length] + '...' if len(self.content) > length else self.content
 
 
+class ArchiveMonth(models.Model):
+    """
+    Number of articles published in a month, kept up to date by signals
+    so the archive sidebar doesn't aggregate the articles table per request.
+    """
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='unique_archive_month'),
+        ]
+
+    @property
+    def date(self):
+        return datetime.date(self.year, self.month, 1)
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d} ({self.count})"
+
+
+class ImageSize(models.Model):
+    """
+    Pixel size of a content image, probed in the background so rendered
+    content can carry width/height attributes. Null sizes mark images that
+    could not be probed.
+    """
+    url = models.URLField(max_length=500, unique=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    checked_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.url} ({self.width}x{self.height})"
+
+
 class ArticleImage(models.Model):
     article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='images')
     image_url = models.URLField()
@@ -238,4 +302,151 @@ class Resource(models.Model):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class Job(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100, db_index=True, help_text="Registered task name, see core/tasks.py")
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Earliest time the job may run")
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Visibility timeout of the current attempt")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class LinkPreview(models.Model):
+    """
+    OpenGraph metadata of an external link, fetched in the background by the
+    refresh_link_previews command so pages never fetch remote sites.
+    """
+    url = models.URLField(max_length=500, unique=True)
+    title = models.CharField(max_length=300, blank=True)
+    description = models.TextField(blank=True)
+    image_url = models.URLField(max_length=500, blank=True)
+    favicon_url = models.URLField(max_length=500, blank=True)
+    etag = models.CharField(max_length=200, blank=True)
+    last_modified = models.CharField(max_length=100, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.CharField(max_length=300, blank=True)
+    fetched_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['url']
+
+    @property
+    def is_available(self):
+        return bool(self.title or self.description or self.image_url)
+
+    def __str__(self):
+        return self.title or self.url
+
+
+class ViewStat(models.Model):
+    """
+    Page views of an article, category or tag over one day, week or month.
+    Day rows are written by core/analytics.py as views happen; week and month
+    rows are rolled up from them by the rollup_analytics command.
+    """
+    DIMENSION_ARTICLE = 'article'
+    DIMENSION_CATEGORY = 'category'
+    DIMENSION_TAG = 'tag'
+    DIMENSION_CHOICES = [
+        (DIMENSION_ARTICLE, 'Article'),
+        (DIMENSION_CATEGORY, 'Category'),
+        (DIMENSION_TAG, 'Tag'),
+    ]
+
+    PERIOD_DAY = 'day'
+    PERIOD_WEEK = 'week'
+    PERIOD_MONTH = 'month'
+    PERIOD_CHOICES = [
+        (PERIOD_DAY, 'Day'),
+        (PERIOD_WEEK, 'Week'),
+        (PERIOD_MONTH, 'Month'),
+    ]
+
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    label = models.CharField(max_length=200, blank=True)
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-period_start', '-views']
+        constraints = [
+            # Also the index behind the dashboard's (dimension, period, date range) lookups
+            models.UniqueConstraint(
+                fields=['dimension', 'period', 'period_start', 'object_id'],
+                name='unique_view_stat',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension} {self.label or self.object_id} {self.period} {self.period_start}: {self.views}"
+
+
+class Image(models.Model):
+    """
+    An image URL used by articles, in their content or as an ArticleImage,
+    with the result of its last availability check. Kept in sync on save by
+    core/image_index.py so usages are indexed lookups instead of content scans.
+    """
+    url = models.URLField(max_length=500, unique=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.CharField(max_length=300, blank=True)
+    is_broken = models.BooleanField(null=True, blank=True, db_index=True, help_text="Unknown until checked")
+    checked_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['url']
+
+    def __str__(self):
+        return self.url
+
+
+class ImageUsage(models.Model):
+    SOURCE_CONTENT = 'content'
+    SOURCE_ATTACHED = 'attached'
+    SOURCE_CHOICES = [
+        (SOURCE_CONTENT, 'Article content'),
+        (SOURCE_ATTACHED, 'Article image'),
+    ]
+
+    image = models.ForeignKey(Image, on_delete=models.CASCADE, related_name='usages')
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='image_usages')
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['image', 'article', 'source'], name='unique_image_usage'),
+        ]
+
+    def __str__(self):
+        return f"{self.image.url} in {self.article.title} ({self.source})"
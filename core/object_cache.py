@@ -0,0 +1,130 @@
+"""
+Read-through cache of detail-page objects keyed by model and slug.
+
+Lookups go through a small in-process LRU first, then the shared Django
+cache (which every process must share, see ``CACHES``), then the database. Unknown slugs are cached too (for a shorter time)
+so bots probing random URLs don't reach the database. Signal handlers in
+``core/signals.py`` call ``invalidate`` on save, delete and slug changes,
+once the transaction commits; other processes' LRU tiers catch up within
+``OBJECT_CACHE_LOCAL_TTL``. Responses the page cache may store are rendered
+from the shared tier only, so a page is never stored with an object another
+process already replaced.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django import shortcuts
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import Http404
+
+from . import page_cache
+
+MISSING = b'missing'
+
+
+class LocalLRU:
+    """Thread-safe LRU of pickled values with a per-entry TTL"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local = LocalLRU(
+    maxsize=settings.OBJECT_CACHE_LOCAL_SIZE,
+    ttl=settings.OBJECT_CACHE_LOCAL_TTL,
+)
+
+
+def _shared():
+    return caches[settings.OBJECT_CACHE_ALIAS]
+
+
+def cache_key(model, slug):
+    return f"objcache:{model._meta.label_lower}:{slug}"
+
+
+def invalidate(model, *slugs):
+    """Drop the cached objects once the current transaction commits, so nothing caches the old rows again"""
+    keys = [cache_key(model, slug) for slug in slugs if slug]
+    if keys:
+        transaction.on_commit(lambda: _delete(keys))
+
+
+def _delete(keys):
+    for key in keys:
+        local.delete(key)
+    _shared().delete_many(keys)
+
+
+def clear():
+    """Drop the local tier, e.g. between tests"""
+    local.clear()
+
+
+def get_object_or_404(queryset, slug):
+    """
+    Like ``django.shortcuts.get_object_or_404(queryset, slug=slug)`` but served
+    from the cache when possible. Every call returns a fresh copy, so callers
+    may modify the object. Cached objects keep their select_related and
+    prefetch_related results.
+    """
+    model = queryset.model
+    if not settings.OBJECT_CACHE_ENABLED:
+        return shortcuts.get_object_or_404(queryset, slug=slug)
+
+    key = cache_key(model, slug)
+    # The local tier isn't invalidated by other processes, see the module docstring
+    data = None if page_cache.storing() else local.get(key)
+    if data is None:
+        negative_ttl = settings.OBJECT_CACHE_NEGATIVE_TTL
+        data = _shared().get(key)
+        if data is None:
+            obj = _lookup(queryset, slug)
+            data = MISSING if obj is None else pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+            _shared().set(key, data, negative_ttl if obj is None else settings.OBJECT_CACHE_TTL)
+        local.set(key, data, min(negative_ttl, local.ttl) if data == MISSING else None)
+
+    if data == MISSING:
+        raise Http404(f"No {model._meta.object_name} matches the given query.")
+    return pickle.loads(data)
+
+
+def _lookup(queryset, slug):
+    try:
+        return queryset.get(slug=slug)
+    except queryset.model.DoesNotExist:
+        return None
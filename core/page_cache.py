@@ -0,0 +1,318 @@
+"""
+Full-page cache for anonymous requests, storing precompressed bodies.
+
+``PageCacheMiddleware`` keeps the responses that ``cache_policy`` marked
+public for their ``s-maxage``, together with their gzip and (when the
+optional ``brotli`` package is installed) brotli encodings, so a hit picks a
+body by ``Accept-Encoding`` and sends it without rendering or compressing
+anything.
+
+Pages are invalidated through their surrogate keys: every key has a content
+version in the cache, ``purge_keys`` replaces the versions of the keys it is
+given, and a page saved under older versions is outdated. Requests with a
+session cookie (logged-in users, the admin) bypass the cache.
+
+Regeneration goes through ``core.single_flight``: one request renders an
+outdated or expiring page while the others are served the old copy, and
+concurrent misses for a page nobody has cached yet wait for the first
+render instead of rendering it again.
+
+A page is only stored when it is known to be fresh: the render must not
+overlap a purge (a purge generation is read before and after it) and must
+not have used a stale value. Code that hands out possibly outdated data, such
+as a stale-while-revalidate fragment, calls ``mark_stale``, and caches with
+a per-process tier skip that tier when ``storing()``.
+
+Views whose side effects must run for every request (such as counting
+article views) register them with ``on_hit``; they are stored with the page
+and called on each hit.
+"""
+import contextvars
+import gzip
+import hashlib
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.module_loading import import_string
+
+from . import single_flight
+
+VERSION_PREFIX = 'pagecache:v:'
+GENERATION_KEY = 'pagecache:generation'
+MAX_AGE_RE = re.compile(r'(?:^|,)\s*(s-maxage|max-age)\s*=\s*(\d+)', re.IGNORECASE)
+COMPRESSIBLE_RE = re.compile(r'^(text/|application/(json|javascript|xml)|image/svg)')
+# Headers describing the body, set again for the chosen variant on each hit
+BODY_HEADERS = {'content-length', 'content-encoding'}
+
+# State of the render in progress whose response may be stored
+_rendering = contextvars.ContextVar('page_cache_rendering', default=None)
+
+
+def _cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+# Content versions
+
+def invalidate(keys):
+    """Give every surrogate key in ``keys`` a new version, orphaning the pages tagged with it"""
+    if keys:
+        cache = _cache()
+        # The generation first: a render that read any of the new versions then
+        # also sees the new generation, and isn't stored
+        cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+        cache.set_many({VERSION_PREFIX + key: uuid.uuid4().hex for key in keys}, None)
+
+
+def generation():
+    """Changes on every ``invalidate``"""
+    return _cache().get(GENERATION_KEY)
+
+
+def versions(keys):
+    """Current version of each key, creating the missing ones"""
+    cache = _cache()
+    versions = {key[len(VERSION_PREFIX):]: value for key, value in cache.get_many([VERSION_PREFIX + k for k in keys]).items()}
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        cache.add(VERSION_PREFIX + key, uuid.uuid4().hex, None)
+    if missing:
+        versions.update(
+            (key[len(VERSION_PREFIX):], value)
+            for key, value in cache.get_many([VERSION_PREFIX + k for k in missing]).items()
+        )
+    return versions
+
+
+# Encodings
+
+def accepted_encodings(header):
+    """Codings in an ``Accept-Encoding`` header that are not refused with q=0"""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q=') and q[2:].strip() in ('0', '0.0', '0.00', '0.000'):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def compress(body):
+    """``{encoding: body}`` with the identity body and its gzip and brotli encodings"""
+    bodies = {'identity': body}
+    if len(body) < settings.PAGE_CACHE_MIN_COMPRESS:
+        return bodies
+    bodies['gzip'] = gzip.compress(body, compresslevel=6, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        bodies['br'] = brotli.compress(body, quality=5)
+    return bodies
+
+
+def choose_encoding(request, bodies):
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoding in ('br', 'gzip'):
+        if encoding in bodies and (encoding in accepted or '*' in accepted):
+            return encoding
+    return 'identity'
+
+
+def build_response(request, page):
+    encoding = choose_encoding(request, page['bodies'])
+    response = HttpResponse(page['bodies'][encoding], status=page['status'])
+    for name, value in page['headers']:
+        response[name] = value
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(len(page['bodies'][encoding]))
+    if len(page['bodies']) > 1:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def fresh_for(response):
+    """
+    Seconds a response stays fresh: its ``s-maxage``, else its ``max-age``,
+    else ``PAGE_CACHE_TTL``
+    """
+    ages = {name.lower(): int(value) for name, value in MAX_AGE_RE.findall(response.get('Cache-Control', ''))}
+    return ages.get('s-maxage', ages.get('max-age', settings.PAGE_CACHE_TTL))
+
+
+# Cache keys
+
+def _vary_headers(response):
+    """Request headers in the response's Vary that select a different page"""
+    # Accept-Encoding picks a stored body; Cookie is covered by the session bypass
+    vary = [h.strip().lower() for h in response.get('Vary', '').split(',') if h.strip()]
+    return [h for h in vary if h not in ('accept-encoding', 'cookie')]
+
+
+def _url_key(request):
+    url = request.build_absolute_uri()
+    return 'pagecache:' + hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+
+
+def _variant(request, headers):
+    values = [request.META.get('HTTP_' + header.upper().replace('-', '_'), '') for header in headers]
+    return '\n'.join(values)
+
+
+# Render state
+
+def storing():
+    """Whether the response being rendered may be stored, so its inputs must be current"""
+    return _rendering.get() is not None
+
+
+def mark_stale():
+    """Keep the response being rendered out of the page cache because it used an outdated value"""
+    state = _rendering.get()
+    if state is not None:
+        state['stale'] = True
+
+
+# Hit callbacks
+
+def on_hit(response, path, *args):
+    """Call ``import_string(path)(*args)`` whenever the page is served from the cache"""
+    callbacks = getattr(response, '_page_cache_on_hit', [])
+    callbacks.append((path, args))
+    response._page_cache_on_hit = callbacks
+    return response
+
+
+# Middleware
+
+class PageCacheMiddleware:
+    """Serves cached pages to anonymous GET and HEAD requests and stores cacheable responses"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self._applies(request):
+            return self.get_response(request)
+
+        page, flight = self._lookup(request)
+        if page is not None:
+            fresh = (
+                versions(page['keys']) == page['versions']
+                and not single_flight.should_refresh(page['delta'], page['expires'])
+            )
+            if fresh:
+                return self._serve(request, page, 'hit')
+            # Outdated or about to expire: one request renders it, the others get this copy meanwhile
+            if not single_flight.acquire(flight):
+                return self._serve(request, page, 'stale')
+        elif not single_flight.acquire(flight):
+            page = single_flight.wait_for(flight, lambda: self._lookup(request)[0])
+            if page is not None:
+                return self._serve(request, page, 'hit')
+            return self._render(request)
+
+        try:
+            return self._render(request)
+        finally:
+            single_flight.release(flight)
+
+    @staticmethod
+    def _lookup(request):
+        """The stored page for this request, or None, and the key its regeneration is locked by"""
+        url_key = _url_key(request)
+        entry = _cache().get(url_key)
+        if entry is None:
+            return None, url_key
+        variant = _variant(request, entry['vary'])
+        return entry['pages'].get(variant), f"{url_key}:{hashlib.md5(variant.encode(), usedforsecurity=False).hexdigest()}"
+
+    @staticmethod
+    def _serve(request, page, status):
+        for path, args in page['on_hit']:
+            import_string(path)(*args)
+        response = get_conditional_response(request, etag=page['etag'])
+        if response is None:
+            response = build_response(request, page)
+        response['X-Page-Cache'] = status
+        return response
+
+    def _render(self, request):
+        state = {'generation': generation(), 'stale': False}
+        token = _rendering.set(state)
+        start = time.time()
+        try:
+            response = self.get_response(request)
+        finally:
+            _rendering.reset(token)
+        if request.method == 'GET' and self._cacheable(response) and not state['stale']:
+            page = self._store(request, response, time.time() - start, state['generation'])
+            if page is not None:
+                response = build_response(request, page)
+                response['X-Page-Cache'] = 'miss'
+        return response
+
+    @staticmethod
+    def _applies(request):
+        return (
+            settings.PAGE_CACHE_ENABLED
+            and request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and not request.path.startswith(tuple(settings.PAGE_CACHE_EXCLUDE_PREFIXES))
+        )
+
+    @staticmethod
+    def _cacheable(response):
+        cache_control = response.get('Cache-Control', '')
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'public' in cache_control
+            and 'private' not in cache_control
+            and 'no-store' not in cache_control
+            and not response.has_header('Content-Encoding')
+            and response.get(settings.SURROGATE_KEY_HEADER)
+            and fresh_for(response) > 0
+        )
+
+    @staticmethod
+    def _store(request, response, delta, rendered_generation):
+        """Store the page unless a purge happened since ``rendered_generation``. Returns it or None"""
+        keys = response[settings.SURROGATE_KEY_HEADER].split()
+        page_versions = versions(keys)
+        if generation() != rendered_generation:
+            return None
+        ttl = fresh_for(response)
+        body = response.content
+        compressible = COMPRESSIBLE_RE.match(response.get('Content-Type', ''))
+        page = {
+            'status': response.status_code,
+            'headers': [(name, value) for name, value in response.items() if name.lower() not in BODY_HEADERS],
+            'bodies': compress(body) if compressible else {'identity': body},
+            'etag': response.get('ETag') or '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest(),
+            'keys': keys,
+            'versions': page_versions,
+            'on_hit': getattr(response, '_page_cache_on_hit', []),
+            'delta': delta,
+            'expires': time.time() + ttl,
+        }
+        if not response.has_header('ETag'):
+            page['headers'].append(('ETag', page['etag']))
+        vary = _vary_headers(response)
+        entry = _cache().get(_url_key(request))
+        if entry is None or entry['vary'] != vary or len(entry['pages']) >= settings.PAGE_CACHE_MAX_VARIANTS:
+            entry = {'vary': vary, 'pages': {}}
+        entry['pages'][_variant(request, vary)] = page
+        # Kept past expiry so it can be served stale while being regenerated
+        _cache().set(_url_key(request), entry, ttl + settings.PAGE_CACHE_STALE_TTL)
+        return page
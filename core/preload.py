@@ -0,0 +1,88 @@
+"""
+``Link: rel=preload/preconnect`` headers and 103 Early Hints.
+
+Site-wide critical assets (stylesheets, fonts, the Tailwind script) are
+listed in ``settings.PRELOAD_LINKS`` and added to every HTML response by
+``PreloadLinkMiddleware``. Views add page-specific hints such as the
+featured image from stored article fields, so no content is parsed.
+
+Under ASGI, ``early_hints`` wraps the application and sends the site-wide
+links as a 103 response before the view runs when the server offers the
+``http.response.early_hint`` extension (e.g. Hypercorn). Only paths routed
+to one of ``settings.EARLY_HINT_URL_NAMES`` get them, since the links are of
+no use to API clients or for error pages. Elsewhere a CDN in front of the
+site can turn the ``Link`` headers into Early Hints itself.
+"""
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+
+def link(url, rel='preload', as_=None, crossorigin=False, fetchpriority=None):
+    """Format one Link header value"""
+    parts = [f"<{url}>", f"rel={rel}"]
+    if as_:
+        parts.append(f"as={as_}")
+    if crossorigin:
+        parts.append('crossorigin')
+    if fetchpriority:
+        parts.append(f"fetchpriority={fetchpriority}")
+    return '; '.join(parts)
+
+
+def image(url):
+    """Preload hint for the page's largest image, or None without one"""
+    return link(url, as_='image', fetchpriority='high') if url else None
+
+
+def site_links():
+    return [link(**spec) for spec in settings.PRELOAD_LINKS]
+
+
+def add_preload_links(response, *links):
+    existing = [value.strip() for value in response.get('Link', '').split(',') if value.strip()]
+    for value in links:
+        if value and value not in existing:
+            existing.append(value)
+    if existing:
+        response['Link'] = ', '.join(existing)
+    return response
+
+
+class PreloadLinkMiddleware:
+    """Adds the site-wide preload links to successful HTML responses"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.status_code == 200 and response.get('Content-Type', '').startswith('text/html'):
+            add_preload_links(response, *site_links())
+        return response
+
+
+def is_page(path):
+    """Whether ``path`` is routed to an HTML page listed in ``EARLY_HINT_URL_NAMES``"""
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return False
+    return match.url_name in settings.EARLY_HINT_URL_NAMES
+
+
+def early_hints(application):
+    """ASGI wrapper sending the site-wide links as 103 Early Hints for page requests"""
+
+    async def app(scope, receive, send):
+        if (
+            scope['type'] == 'http'
+            and scope.get('method') == 'GET'
+            and 'http.response.early_hint' in scope.get('extensions', {})
+            and is_page(scope.get('path', ''))
+        ):
+            links = [value.encode('latin-1') for value in site_links()]
+            if links:
+                await send({'type': 'http.response.early_hint', 'links': links})
+        await application(scope, receive, send)
+
+    return app
@@ -0,0 +1,89 @@
+"""
+Per-view query budgets.
+
+``@query_budget(max_queries=..., max_db_ms=...)`` counts the queries a view
+runs (including template rendering) on the default database. Going over
+budget raises ``QueryBudgetExceeded`` when ``QUERY_BUDGET_RAISE`` is on
+(DEBUG and the test suite) and otherwise logs the queries together with the
+code that issued them.
+"""
+import logging
+import time
+import traceback
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` callable recording SQL, duration and caller"""
+
+    def __init__(self, capture_stacks=True):
+        self.capture_stacks = capture_stacks
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.queries.append((sql, duration, self._caller() if self.capture_stacks else ''))
+
+    @staticmethod
+    def _caller():
+        """Innermost project frames (views, models, template tags) that led to the query"""
+        base_dir = str(settings.BASE_DIR)
+        frames = [
+            frame for frame in traceback.extract_stack()[:-3]
+            if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+        ]
+        return ' <- '.join(f"{frame.filename[len(base_dir) + 1:]}:{frame.lineno} {frame.name}" for frame in reversed(frames[-3:]))
+
+    @property
+    def total_ms(self):
+        return sum(duration for _, duration, _ in self.queries)
+
+    def report(self):
+        return '\n'.join(
+            f"  {i}. {duration:.1f}ms {sql[:300]}\n     at {caller or '?'}"
+            for i, (sql, duration, caller) in enumerate(self.queries, 1)
+        )
+
+
+def query_budget(max_queries=None, max_db_ms=None):
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not settings.QUERY_BUDGET_ENABLED:
+                return view_func(request, *args, **kwargs)
+
+            recorder = QueryRecorder(settings.QUERY_BUDGET_CAPTURE_STACKS)
+            with connection.execute_wrapper(recorder):
+                response = view_func(request, *args, **kwargs)
+                if hasattr(response, 'render') and not response.is_rendered:
+                    response.render()
+
+            problems = []
+            if max_queries is not None and len(recorder.queries) > max_queries:
+                problems.append(f"{len(recorder.queries)} queries (budget {max_queries})")
+            if max_db_ms is not None and recorder.total_ms > max_db_ms:
+                problems.append(f"{recorder.total_ms:.1f}ms in the database (budget {max_db_ms}ms)")
+
+            if problems:
+                message = f"{view_func.__name__} ({request.path}) exceeded its query budget: {', '.join(problems)}\n{recorder.report()}"
+                if settings.QUERY_BUDGET_RAISE:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+
+        wrapper.query_budget = {'max_queries': max_queries, 'max_db_ms': max_db_ms}
+        return wrapper
+    return decorator
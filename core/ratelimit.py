@@ -0,0 +1,188 @@
+"""
+Token-bucket rate limiting and load shedding for expensive views.
+
+Limits are configured per URL name in ``settings.RATE_LIMITS``::
+
+    RATE_LIMITS = {
+        'search': {
+            'rate': 1, 'burst': 10,                # per client, tokens/second
+            'global_rate': 20, 'global_burst': 40,  # all clients together
+            'max_concurrent': 4,                    # in-flight requests per process
+        },
+    }
+
+A client over its own bucket gets 429, an exhausted global bucket or too many
+in-flight requests gets 503; both carry ``Retry-After``. Buckets live in
+process memory or, with ``RATE_LIMIT_BACKEND = 'cache'``, in the shared cache.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+OUTCOMES = ('allowed', 'limited', 'shed')
+
+
+class MemoryBuckets:
+    """Token buckets in a bounded LRU dict, shared by the threads of one process"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take one token. Returns 0 if allowed, otherwise seconds until a token is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class CacheBuckets:
+    """
+    Token buckets in the Django cache so every worker shares them.
+    The read-modify-write is not atomic, so limits are approximate under
+    heavy concurrency, which is fine for shedding abusive traffic.
+    """
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def take(self, key, rate, burst):
+        now = time.time()
+        cache_key = f"ratelimit:bucket:{key}"
+        tokens, updated = self.cache.get(cache_key, (burst, now))
+        tokens = min(burst, tokens + max(now - updated, 0) * rate)
+        wait = 0 if tokens >= 1 else (1 - tokens) / rate
+        if not wait:
+            tokens -= 1
+        # Keep the entry until the bucket would have refilled anyway
+        self.cache.set(cache_key, (tokens, now), timeout=math.ceil(burst / rate) + 1)
+        return wait
+
+
+class ConcurrencyLimiter:
+    """Counts in-flight requests per URL name in this process"""
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, name, limit):
+        with self._lock:
+            current = self._in_flight.get(name, 0)
+            if current >= limit:
+                return False
+            self._in_flight[name] = current + 1
+            return True
+
+    def release(self, name):
+        with self._lock:
+            self._in_flight[name] = max(self._in_flight.get(name, 0) - 1, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._in_flight)
+
+
+def _counter_cache():
+    return caches[settings.RATE_LIMIT_CACHE_ALIAS]
+
+
+def count(name, outcome):
+    """Increment a monitoring counter, shared across workers when the cache is"""
+    cache = _counter_cache()
+    key = f"ratelimit:count:{name}:{outcome}"
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def stats():
+    """Counters for every configured URL name, e.g. ``{'search': {'allowed': 10, ...}}``"""
+    cache = _counter_cache()
+    result = {}
+    for name in settings.RATE_LIMITS:
+        keys = {f"ratelimit:count:{name}:{outcome}": outcome for outcome in OUTCOMES}
+        values = cache.get_many(keys)
+        result[name] = {outcome: values.get(key, 0) for key, outcome in keys.items()}
+    return result
+
+
+def client_id(request):
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+def _too_many(status, retry_after, message):
+    response = HttpResponse(message, status=status, content_type='text/plain')
+    response['Retry-After'] = str(max(math.ceil(retry_after), 1))
+    return response
+
+
+class RateLimitMiddleware:
+    concurrency = ConcurrencyLimiter()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.RATE_LIMIT_BACKEND == 'cache':
+            self.buckets = CacheBuckets(settings.RATE_LIMIT_CACHE_ALIAS)
+        else:
+            self.buckets = MemoryBuckets()
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            name = getattr(request, '_rate_limit_slot', None)
+            if name is not None:
+                self.concurrency.release(name)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        name = match.url_name if match else None
+        limits = settings.RATE_LIMITS.get(name)
+        if not limits:
+            return None
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return None
+
+        if 'rate' in limits:
+            wait = self.buckets.take(f"{name}:{client_id(request)}", limits['rate'], limits.get('burst', limits['rate']))
+            if wait:
+                count(name, 'limited')
+                return _too_many(429, wait, 'Too many requests, please slow down.')
+
+        if 'global_rate' in limits:
+            wait = self.buckets.take(f"{name}:*", limits['global_rate'], limits.get('global_burst', limits['global_rate']))
+            if wait:
+                count(name, 'shed')
+                return _too_many(503, wait, 'Service busy, please retry shortly.')
+
+        if 'max_concurrent' in limits:
+            if not self.concurrency.acquire(name, limits['max_concurrent']):
+                count(name, 'shed')
+                return _too_many(503, 1, 'Service busy, please retry shortly.')
+            request._rate_limit_slot = name
+
+        count(name, 'allowed')
+        return None
@@ -0,0 +1,210 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from taggit.models import Tag
+
+from . import archive, image_index, object_cache, suggest
+from .jobs import enqueue
+from .models import Article, ArticleImage, Category, ImageUsage, Tool, Resource
+from .surrogate import NAV_KEY, category_key, list_key, object_key, purge_keys, tag_key
+
+
+def _rerender_only(update_fields):
+    """Saves that only refresh the rendered content (see core.tasks.probe_image_sizes)"""
+    return update_fields is not None and set(update_fields) == {'rendered_content', 'content_images'}
+
+
+@receiver(post_save, sender=Article)
+def queue_image_validation(sender, instance, update_fields=None, **kwargs):
+    """Validate article images in the background instead of on demand"""
+    if not _rerender_only(update_fields):
+        enqueue('core.validate_article_images', {'article_id': instance.pk})
+
+
+@receiver(post_save, sender=Article)
+def queue_image_size_probe(sender, instance, update_fields=None, **kwargs):
+    """Probe new content images so the next render can size them"""
+    if not _rerender_only(update_fields) and '<img' in instance.rendered_content:
+        enqueue('core.probe_image_sizes', {'article_id': instance.pk})
+
+
+# Previous state, used by the handlers below
+
+PREVIOUS_FIELDS = {
+    Article: ['category_id', 'published_at', 'slug'],
+    Tool: ['category_id', 'slug'],
+    Resource: ['category_id', 'slug'],
+    Category: ['slug'],
+    Tag: ['slug'],
+}
+
+
+@receiver(pre_save)
+def remember_previous_state(sender, instance, **kwargs):
+    """
+    Keep the stored values of fields whose changes matter to the handlers
+    below (old category pages, archive months, cached slugs).
+    """
+    fields = PREVIOUS_FIELDS.get(sender)
+    if fields is None:
+        return
+    instance._previous = {}
+    if instance.pk:
+        instance._previous = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+def _previous(instance, field):
+    return getattr(instance, '_previous', {}).get(field)
+
+
+# Front-end cache purging
+
+def _content_keys(instance, created):
+    sender = type(instance)
+    old_category_id = _previous(instance, 'category_id')
+    keys = [object_key(instance), list_key(sender), category_key(sender, instance.category_id)]
+    if old_category_id != instance.category_id:
+        keys.append(category_key(sender, old_category_id))
+    # The footer lists categories that have content, so it changes with category membership
+    if created or old_category_id != instance.category_id:
+        keys.append(NAV_KEY)
+    return keys
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Tool)
+@receiver(post_save, sender=Resource)
+def purge_content(sender, instance, created, **kwargs):
+    keys = _content_keys(instance, created)
+    if sender is Article:
+        keys.extend(tag_key(slug) for slug in instance.tags.values_list('slug', flat=True))
+    purge_keys(keys)
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Tool)
+@receiver(post_delete, sender=Resource)
+def purge_deleted_content(sender, instance, **kwargs):
+    purge_keys(_content_keys(instance, created=True))
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def purge_article_tags(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear') or not isinstance(instance, Article):
+        return
+    tags = Tag.objects.filter(pk__in=pk_set) if pk_set else instance.tags.all()
+    purge_keys([object_key(instance), *(tag_key(slug) for slug in tags.values_list('slug', flat=True))])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def purge_category(sender, instance, **kwargs):
+    purge_keys([
+        object_key(instance),
+        list_key(Category),
+        NAV_KEY,
+        category_key(Article, instance.pk),
+        category_key(Tool, instance.pk),
+        category_key(Resource, instance.pk),
+    ])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def purge_tag(sender, instance, **kwargs):
+    keys = [object_key(instance), list_key(Tag), tag_key(instance.slug)]
+    old_slug = _previous(instance, 'slug')
+    if old_slug and old_slug != instance.slug:
+        keys.append(tag_key(old_slug))
+    purge_keys(keys)
+
+
+# Archive month counts
+
+@receiver(post_save, sender=Article)
+def update_archive_on_save(sender, instance, created, **kwargs):
+    old_published_at = _previous(instance, 'published_at')
+    if created or old_published_at is None:
+        archive.adjust(instance.published_at, 1)
+    elif archive.month_of(old_published_at) != archive.month_of(instance.published_at):
+        archive.adjust(old_published_at, -1)
+        archive.adjust(instance.published_at, 1)
+
+
+@receiver(post_delete, sender=Article)
+def update_archive_on_delete(sender, instance, **kwargs):
+    archive.adjust(instance.published_at, -1)
+
+
+# Object cache invalidation
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Tool)
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Tool)
+@receiver(post_delete, sender=Resource)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def invalidate_cached_object(sender, instance, **kwargs):
+    object_cache.invalidate(sender, instance.slug, _previous(instance, 'slug'))
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def invalidate_cached_category_members(sender, instance, **kwargs):
+    """Cached articles, tools and resources carry their category along"""
+    for model in (Article, Tool, Resource):
+        object_cache.invalidate(model, *model.objects.filter(category=instance).values_list('slug', flat=True))
+
+
+@receiver(post_save, sender=ArticleImage)
+@receiver(post_delete, sender=ArticleImage)
+def invalidate_cached_article_images(sender, instance, **kwargs):
+    object_cache.invalidate(Article, *Article.objects.filter(pk=instance.article_id).values_list('slug', flat=True))
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def invalidate_cached_article_tags(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Article):
+        object_cache.invalidate(Article, instance.slug)
+
+
+# Search suggestion index
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Tool)
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def update_suggestion_index(sender, instance, update_fields=None, **kwargs):
+    if not _rerender_only(update_fields):
+        suggest.update(instance)
+        purge_keys([suggest.SURROGATE_KEY])
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Tool)
+@receiver(post_delete, sender=Resource)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def remove_from_suggestion_index(sender, instance, **kwargs):
+    suggest.remove(instance)
+    purge_keys([suggest.SURROGATE_KEY])
+
+
+# Image usage index
+
+@receiver(post_save, sender=Article)
+def index_article_images(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'content' in update_fields:
+        image_index.sync_article(instance, sources=[ImageUsage.SOURCE_CONTENT])
+
+
+@receiver(post_save, sender=ArticleImage)
+@receiver(post_delete, sender=ArticleImage)
+def index_attached_images(sender, instance, **kwargs):
+    article = Article.objects.filter(pk=instance.article_id).first()
+    if article is not None:
+        image_index.sync_article(article, sources=[ImageUsage.SOURCE_ATTACHED])
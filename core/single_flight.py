@@ -0,0 +1,120 @@
+"""
+Stampede protection for cached values.
+
+``get_or_set`` makes sure only one caller regenerates a value at a time:
+a per-key flag stops other threads in this process, and a short-lived lock
+key in the shared cache stops other workers. The rest keep getting the
+stale value while the new one is computed, or wait briefly for it when there
+is no value at all.
+
+Values are refreshed a little before they expire, with a probability that
+grows towards the expiry time and with the time the value took to compute
+(the "XFetch" algorithm). Busy keys are therefore usually refreshed before
+anyone sees them missing. A value stored with a ``version`` is also
+refreshed when the caller passes a different version. Callers that must
+know when they were handed an outdated value pass ``on_stale``.
+"""
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+LOCK_PREFIX = 'single-flight:'
+
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.SINGLE_FLIGHT_CACHE_ALIAS]
+
+
+def acquire(key):
+    """Become the one regenerating ``key``, without waiting. Returns whether it worked"""
+    with _in_flight_lock:
+        if key in _in_flight:
+            return False
+        _in_flight.add(key)
+    if _cache().add(LOCK_PREFIX + key, 1, settings.SINGLE_FLIGHT_LOCK_TTL):
+        return True
+    with _in_flight_lock:
+        _in_flight.discard(key)
+    return False
+
+
+def release(key):
+    _cache().delete(LOCK_PREFIX + key)
+    with _in_flight_lock:
+        _in_flight.discard(key)
+
+
+def should_refresh(delta, expires, beta=None, now=None):
+    """
+    XFetch: refresh early with a probability that rises as ``expires`` (a
+    timestamp) nears, sooner for values that took ``delta`` seconds to compute
+    """
+    beta = settings.SINGLE_FLIGHT_BETA if beta is None else beta
+    now = time.time() if now is None else now
+    return now - delta * beta * math.log(1.0 - random.random()) >= expires
+
+
+def wait_for(key, get, timeout=None):
+    """
+    Poll ``get()`` while someone else regenerates ``key``. Returns its result
+    once it is not None, or None when the lock is released without a value
+    (e.g. the computation failed) or after ``timeout`` seconds.
+    """
+    cache = _cache()
+    deadline = time.monotonic() + (settings.SINGLE_FLIGHT_WAIT if timeout is None else timeout)
+    while time.monotonic() < deadline:
+        time.sleep(0.02)
+        value = get()
+        if value is not None or cache.get(LOCK_PREFIX + key) is None:
+            return value
+    return None
+
+
+def get_or_set(key, compute, ttl, stale_ttl=None, version=None, on_stale=None):
+    """
+    The cached value of ``key``, calling ``compute()`` to regenerate it at
+    most once at a time. Values stay usable as stale for ``stale_ttl``
+    seconds (default ``ttl``) after they expire; ``on_stale()`` is called
+    when such a value, or one stored with another version, is returned.
+    """
+    cache = _cache()
+    entry = cache.get(key)
+    if entry is not None:
+        value, stored_version, delta, expires = entry
+        if stored_version == version and not should_refresh(delta, expires):
+            return value
+        if not acquire(key):
+            if on_stale is not None and (stored_version != version or time.time() >= expires):
+                on_stale()
+            return value
+        try:
+            return _compute(cache, key, compute, ttl, stale_ttl, version)
+        finally:
+            release(key)
+
+    if acquire(key):
+        try:
+            return _compute(cache, key, compute, ttl, stale_ttl, version)
+        finally:
+            release(key)
+    entry = wait_for(key, lambda: cache.get(key))
+    if entry is not None:
+        return entry[0]
+    # The other computation failed or is too slow; don't keep this request waiting
+    return compute()
+
+
+def _compute(cache, key, compute, ttl, stale_ttl, version):
+    start = time.time()
+    value = compute()
+    delta = time.time() - start
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    cache.set(key, (value, version, delta, time.time() + ttl), ttl + stale_ttl)
+    return value
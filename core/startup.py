@@ -0,0 +1,84 @@
+"""
+Cold-start measurement.
+
+``measure`` boots Django in a fresh interpreter started with
+``-X importtime`` and returns how long ``django.setup()`` took and what each
+module cost to import. The ``profile_startup`` command prints it, and the
+test suite checks it against ``STARTUP_TIME_BUDGET`` and
+``STARTUP_LAZY_MODULES``, the heavy packages that must only load on first use.
+"""
+import json
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+
+from django.conf import settings
+
+BOOT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter() - start
+if {urls!r}:
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+print(json.dumps({{'setup': setup, 'total': time.perf_counter() - start, 'modules': sorted(sys.modules)}}))
+"""
+
+
+@dataclass
+class ModuleImport:
+    name: str
+    self_us: int
+    cumulative_us: int
+
+
+@dataclass
+class StartupProfile:
+    setup_seconds: float
+    total_seconds: float
+    modules: list
+    imports: list
+
+    def slowest(self, count=20, top_level=False):
+        """Imports with the highest cumulative cost, optionally only top-level packages"""
+        imports = [i for i in self.imports if not top_level or '.' not in i.name]
+        return sorted(imports, key=lambda i: i.cumulative_us, reverse=True)[:count]
+
+    def loaded(self, packages):
+        """Which of ``packages`` (or their submodules) were imported"""
+        return sorted(
+            package for package in packages
+            if any(module == package or module.startswith(package + '.') for module in self.modules)
+        )
+
+
+def parse_importtime(output):
+    """``ModuleImport`` rows from ``-X importtime`` stderr output"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|', 2))
+        imports.append(ModuleImport(name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure(urls=False, settings_module=None):
+    """
+    Boot Django in a new process and profile it. With ``urls`` the URLconf is
+    loaded too, which imports the views as the first request would.
+    Import timing adds some overhead, so times are a little pessimistic.
+    """
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': settings_module or os.environ.get('DJANGO_SETTINGS_MODULE', 'pezawebsite.settings'),
+    }
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT.format(urls=urls)],
+        capture_output=True, text=True, env=env, cwd=str(settings.BASE_DIR), check=True,
+    )
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return StartupProfile(data['setup'], data['total'], data['modules'], parse_importtime(result.stderr))
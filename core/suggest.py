@@ -0,0 +1,257 @@
+"""
+Search-as-you-type suggestions from an in-process prefix index.
+
+Article titles, tag, category, tool and resource names are kept in a sorted
+array of normalized keys, so a lookup is a binary search plus a short scan
+and never touches the database. Every word of a name is indexed, so "dja"
+finds "Getting started with Django".
+
+The index is built on first use. Signal handlers in ``core/signals.py`` call
+``update`` and ``remove`` to patch this process's copy and append the change
+to a numbered log in the cache shared by all processes (see ``CACHES``).
+Every process checks the log every ``SUGGEST_VERSION_CHECK`` seconds and
+applies the changes it hasn't seen; it only rebuilds its index when some of
+them are missing (expired, evicted, or numbered twice by a cache whose
+``incr`` isn't atomic, which starts a new epoch).
+"""
+import threading
+import time
+import unicodedata
+import uuid
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from taggit.models import Tag
+
+from .models import Article, Category, Resource, Tool
+from .object_cache import LocalLRU
+
+EPOCH_KEY = 'suggest:epoch'
+SEQUENCE_KEY = 'suggest:sequence'
+CHANGE_PREFIX = 'suggest:change:'
+# Processes further behind than this rebuild instead of replaying the log
+MAX_CHANGES = 500
+CHANGE_TTL = 3600
+SURROGATE_KEY = 'suggest'
+
+
+def normalize(text):
+    """Lowercase and strip accents, so "Café" and "cafe" match"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).casefold().strip()
+
+
+@dataclass(frozen=True)
+class Entry:
+    kind: str
+    pk: int
+    label: str
+    url: str
+    rank: int = 0
+
+    @property
+    def id(self):
+        return (self.kind, self.pk)
+
+
+def entry_for(instance):
+    """Suggestion for a model instance, or None for unindexed models"""
+    if isinstance(instance, Article):
+        return Entry('article', instance.pk, instance.title, reverse('article_detail', args=[instance.slug]), instance.views)
+    if isinstance(instance, Tool):
+        return Entry('tool', instance.pk, instance.name, reverse('tool_detail', args=[instance.slug]))
+    if isinstance(instance, Resource):
+        return Entry('resource', instance.pk, instance.name, reverse('resource_detail', args=[instance.slug]))
+    if isinstance(instance, Category):
+        return Entry('category', instance.pk, instance.name, reverse('articles_by_category', args=[instance.slug]))
+    if isinstance(instance, Tag):
+        return Entry('tag', instance.pk, instance.name, reverse('articles_by_tag', args=[instance.slug]))
+    return None
+
+
+class PrefixIndex:
+    """Sorted array of ``(key, entry id)`` pairs with prefix lookup"""
+
+    def __init__(self, entries=()):
+        self.entries = {}
+        self.keys = []
+        self._lock = threading.Lock()
+        for entry in entries:
+            self.entries[entry.id] = entry
+            self.keys.extend((key, entry.id) for key in self._keys(entry))
+        self.keys.sort()
+
+    @staticmethod
+    def _keys(entry):
+        """The whole label and every later word of it"""
+        words = normalize(entry.label).split()
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    def add(self, entry):
+        with self._lock:
+            self._discard(entry.id)
+            self.entries[entry.id] = entry
+            for key in self._keys(entry):
+                insort(self.keys, (key, entry.id))
+
+    def remove(self, entry_id):
+        with self._lock:
+            self._discard(entry_id)
+
+    def _discard(self, entry_id):
+        old = self.entries.pop(entry_id, None)
+        if old is not None:
+            for key in self._keys(old):
+                index = bisect_left(self.keys, (key, entry_id))
+                if index < len(self.keys) and self.keys[index] == (key, entry_id):
+                    del self.keys[index]
+
+    def search(self, query, limit=8, scan=200):
+        """
+        Entries with a word starting with ``query``. Matches at the start of
+        the label come first, then by rank (article views) and shorter labels.
+        At most ``scan`` index keys are looked at, which bounds the cost of
+        one-letter queries.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        matches = {}
+        with self._lock:
+            index = bisect_left(self.keys, (prefix,))
+            for key, entry_id in self.keys[index:index + scan]:
+                if not key.startswith(prefix):
+                    break
+                entry = self.entries[entry_id]
+                at_start = normalize(entry.label).startswith(prefix)
+                matches[entry_id] = matches.get(entry_id, False) or at_start
+            ranked = sorted(
+                (self.entries[entry_id] for entry_id in matches),
+                key=lambda entry: (not matches[entry.id], -entry.rank, len(entry.label), entry.label),
+            )
+        return ranked[:limit]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def build():
+    """A fresh index of everything searchable"""
+    instances = [
+        *Article.objects.only('pk', 'title', 'slug', 'views'),
+        *Tool.objects.only('pk', 'name', 'slug'),
+        *Resource.objects.only('pk', 'name', 'slug'),
+        *Category.objects.only('pk', 'name', 'slug'),
+        *Tag.objects.only('pk', 'name', 'slug'),
+    ]
+    return PrefixIndex(entry for entry in map(entry_for, instances) if entry is not None)
+
+
+_index = None
+_epoch = None
+_sequence = 0
+_checked = 0.0
+_build_lock = threading.Lock()
+_results = LocalLRU(maxsize=2000, ttl=60)
+
+
+def get_index():
+    """This process's index, brought up to date with the changes other processes logged"""
+    global _index, _epoch, _sequence, _checked
+    now = time.monotonic()
+    if _index is not None and now - _checked < settings.SUGGEST_VERSION_CHECK:
+        return _index
+    state = cache.get_many([EPOCH_KEY, SEQUENCE_KEY])
+    epoch, sequence = state.get(EPOCH_KEY), state.get(SEQUENCE_KEY, 0)
+    with _build_lock:
+        if _index is None or epoch != _epoch or not _catch_up(sequence):
+            _index = build()
+            _epoch, _sequence = epoch, sequence
+            _results.clear()
+        _checked = now
+    return _index
+
+
+def _catch_up(sequence):
+    """Apply the logged changes up to ``sequence``. Returns False when some are missing"""
+    global _sequence
+    if sequence == _sequence:
+        return True
+    if not _sequence < sequence <= _sequence + MAX_CHANGES:
+        return False
+    keys = [CHANGE_PREFIX + str(number) for number in range(_sequence + 1, sequence + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) < len(keys):
+        return False
+    # Changes this process made are applied again, which leaves the index as it is
+    for key in keys:
+        action, value = changes[key]
+        if action == 'add':
+            _index.add(value)
+        else:
+            _index.remove(value)
+    _sequence = sequence
+    _results.clear()
+    return True
+
+
+def suggestions(query):
+    """Up to ``SUGGEST_LIMIT`` suggestions for ``query`` as JSON-ready dicts"""
+    query = normalize(query)[:100]
+    if len(query) < settings.SUGGEST_MIN_LENGTH:
+        return []
+    index = get_index()
+    results = _results.get(query)
+    if results is None:
+        results = [
+            {'type': entry.kind, 'label': entry.label, 'url': entry.url}
+            for entry in index.search(query, limit=settings.SUGGEST_LIMIT)
+        ]
+        _results.set(query, results)
+    return results
+
+
+def _log(action, value):
+    """Append a change for the other processes and drop our cached results"""
+    cache.add(SEQUENCE_KEY, 0, None)
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        sequence = None
+    if sequence is None or not cache.add(CHANGE_PREFIX + str(sequence), (action, value), CHANGE_TTL):
+        # The number was taken by a concurrent change: every process rebuilds
+        cache.set(EPOCH_KEY, uuid.uuid4().hex, None)
+    _results.clear()
+
+
+def update(instance):
+    """Index a saved instance"""
+    entry = entry_for(instance)
+    if entry is None:
+        return
+    if _index is not None:
+        _index.add(entry)
+    _log('add', entry)
+
+
+def remove(instance):
+    """Drop a deleted instance from the index"""
+    entry = entry_for(instance)
+    if entry is None:
+        return
+    if _index is not None:
+        _index.remove(entry.id)
+    _log('remove', entry.id)
+
+
+def clear():
+    """Forget the index, e.g. between tests"""
+    global _index, _epoch, _sequence
+    with _build_lock:
+        _index = None
+        _epoch = None
+        _sequence = 0
+        _results.clear()
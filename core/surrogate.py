@@ -0,0 +1,135 @@
+"""
+Surrogate-key tagging and targeted purging for the front-end HTTP cache.
+
+Views tag their responses with the keys of the objects they render and set a
+``Cache-Control`` policy with ``cache_policy``. When content changes, the
+signal handlers in ``core/signals.py`` queue a purge of exactly the affected
+keys, which the configured purger (``SURROGATE_PURGER``) sends to the proxy.
+"""
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+
+from . import page_cache
+from .jobs import enqueue
+
+logger = logging.getLogger(__name__)
+
+NAV_KEY = 'nav'
+
+
+def object_key(obj):
+    """Key of a single object, e.g. ``article-12``"""
+    return f"{obj._meta.model_name}-{obj.pk}"
+
+
+def list_key(model):
+    """Key of the full listing pages of a model, e.g. ``article-list``"""
+    return f"{model._meta.model_name}-list"
+
+
+def category_key(model, category_id):
+    """Key of pages listing a model's objects within one category, e.g. ``tool-category-3``"""
+    if category_id is None:
+        return None
+    return f"{model._meta.model_name}-category-{category_id}"
+
+
+def tag_key(slug):
+    """Key of the pages listing articles with a tag, e.g. ``tag-slug-python``"""
+    # Not "tag-<slug>", which would collide with object keys ("tag-12") and "tag-list"
+    return f"tag-slug-{slug}"
+
+
+def add_surrogate_keys(response, *keys):
+    """Append keys to the response's surrogate-key header"""
+    header = settings.SURROGATE_KEY_HEADER
+    existing = response.get(header, '').split()
+    for key in keys:
+        if key and key not in existing:
+            existing.append(key)
+    response[header] = ' '.join(existing)
+    return response
+
+
+def cache_policy(max_age=0, s_maxage=300):
+    """
+    Set the browser (``max_age``) and shared cache (``s_maxage``) lifetimes
+    of a view's responses. Authenticated users always get private responses.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                patch_cache_control(response, private=True, max_age=0)
+            else:
+                patch_cache_control(response, public=True, max_age=max_age, s_maxage=s_maxage)
+            return response
+        return wrapper
+    return decorator
+
+
+class BasePurger:
+    def purge(self, keys):
+        raise NotImplementedError
+
+
+class LogPurger(BasePurger):
+    """Only logs the keys, for sites without a front-end cache"""
+
+    def purge(self, keys):
+        logger.debug("Purged surrogate keys: %s", ' '.join(keys))
+
+
+class LocalPurger(BasePurger):
+    """Records purged keys in memory, for tests. Empty ``purged`` between tests."""
+
+    purged = []
+
+    def purge(self, keys):
+        LocalPurger.purged.extend(keys)
+
+
+class HttpPurger(BasePurger):
+    """
+    Sends one purge request per batch of keys to ``SURROGATE_PURGE_URL``
+    with the keys in the surrogate-key header.
+    """
+
+    batch_size = 256
+
+    def purge(self, keys):
+        import requests
+
+        url = settings.SURROGATE_PURGE_URL
+        header = settings.SURROGATE_KEY_HEADER
+        headers = dict(settings.SURROGATE_PURGE_HEADERS)
+        for start in range(0, len(keys), self.batch_size):
+            headers[header] = ' '.join(keys[start:start + self.batch_size])
+            response = requests.request('PURGE', url, headers=headers, timeout=10)
+            response.raise_for_status()
+
+
+def get_purger():
+    path = settings.SURROGATE_PURGER
+    return import_string(path)()
+
+
+def purge_keys(keys):
+    """
+    Invalidate the pages tagged with the given keys in the page cache once
+    the current transaction commits and queue their purge from the front-end
+    cache, off the request thread
+    """
+    keys = sorted(set(k for k in keys if k))
+    if keys:
+        transaction.on_commit(lambda: page_cache.invalidate(keys))
+        enqueue('core.purge_surrogate_keys', {'keys': keys})
@@ -0,0 +1,59 @@
+"""
+Background tasks run by the ``run_worker`` management command.
+Queue them with ``core.jobs.enqueue(<task name>, {...})``.
+"""
+import logging
+
+from . import image_index
+from .content import content_image_urls, probe_image_size
+from .jobs import task
+from .models import Article, Image, ImageSize
+from .surrogate import get_purger
+
+logger = logging.getLogger(__name__)
+
+
+@task('core.validate_article_images')
+def validate_article_images(article_id):
+    """Check the article's images that have not been checked yet and log the broken ones"""
+    article = Article.objects.filter(pk=article_id).first()
+    if article is None:
+        return
+
+    images = Image.objects.filter(usages__article=article, checked_at__isnull=True).distinct()
+    for image in images:
+        status_code, error = image_index.check(image.url)
+        if status_code != 200:
+            logger.warning("Broken image in '%s': %s (%s)", article.title, image.url, error or f"Status: {status_code}")
+
+
+@task('core.purge_surrogate_keys')
+def purge_surrogate_keys(keys):
+    """Ask the front-end cache to drop every response tagged with one of ``keys``"""
+    get_purger().purge(keys)
+
+
+@task('core.probe_image_sizes')
+def probe_image_sizes(article_id):
+    """Record the size of new content images, then re-render the article with them"""
+    import requests
+
+    article = Article.objects.filter(pk=article_id).first()
+    if article is None:
+        return
+
+    # Original URLs, before any resize rewriting in the rendered content
+    urls = set(content_image_urls(article))
+    known = set(ImageSize.objects.filter(url__in=urls).values_list('url', flat=True))
+    found = False
+    session = requests.Session()
+    for url in sorted(u for u in urls - known if u and u.startswith(('http://', 'https://'))):
+        size = probe_image_size(url, session=session)
+        ImageSize.objects.update_or_create(
+            url=url[:500],
+            defaults={'width': size[0] if size else None, 'height': size[1] if size else None},
+        )
+        found = found or size is not None
+
+    if found:
+        article.save(update_fields=['rendered_content'])
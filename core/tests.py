@@ -1,3 +1,959 @@
-from django.test import TestCase
+import gzip
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils.cache import patch_vary_headers
+from django.utils import timezone
+
+from . import (
+    analytics, archive, image_index, jobs, link_previews, object_cache, page_cache, ratelimit, single_flight, startup,
+    preload, suggest, views,
+)
+from .admin import ViewStatAdmin
+from .models import ArchiveMonth, Article, ArticleImage, Category, Image, ImageSize, Job, LinkPreview, Resource, Tool, ViewStat
+from .query_budget import QueryBudgetExceeded, query_budget
+from .surrogate import LocalPurger, add_surrogate_keys, cache_policy, list_key, object_key
+
+# Every test gets a local-memory cache, keeping what they cache out of the
+# file cache used by runserver
+local_caches = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+
+
+def setUpModule():
+    local_caches.enable()
+
+
+def tearDownModule():
+    local_caches.disable()
+
+
+def seed(size):
+    """Create ``size`` articles, tools and resources spread over a few categories and tags"""
+    categories = [Category.objects.create(name=f"Category {i}") for i in range(3)]
+    for i in range(size):
+        category = categories[i % len(categories)]
+        article = Article.objects.create(
+            title=f"Article {i}",
+            content=f'<p>Python article {i}</p><img src="https://img.example.com/{i}.png">',
+            category=category,
+            read_time=5,
+            is_tutorial=bool(i % 2),
+            is_featured=(i == 0),
+            published_at=timezone.now() - timezone.timedelta(days=i),
+        )
+        article.tags.add('python', f"tag-{i % 4}")
+        ArticleImage.objects.create(article=article, image_url=f"https://img.example.com/banner-{i}.png", is_banner=True)
+        Tool.objects.create(name=f"Tool {i}", description='A tool', category=category, external_link=f"https://tool{i}.example.com")
+        Resource.objects.create(name=f"Resource {i}", description='A resource', category=category, external_link=f"https://res{i}.example.com")
+
+
+def routes():
+    now = timezone.localtime()
+    return [
+        reverse('home'),
+        reverse('tutorials'),
+        reverse('blog'),
+        reverse('article_detail', kwargs={'slug': 'article-1'}),
+        reverse('tools'),
+        reverse('tool_detail', kwargs={'slug': 'tool-1'}),
+        reverse('resources'),
+        reverse('resource_detail', kwargs={'slug': 'resource-1'}),
+        reverse('articles_by_category', kwargs={'slug': 'category-1'}),
+        reverse('articles_by_tag', kwargs={'tag': 'python'}),
+        reverse('search') + '?q=python',
+        reverse('article_archive_year', kwargs={'year': now.year}),
+        reverse('article_archive_month', kwargs={'year': now.year, 'month': now.month}),
+        reverse('search_suggestions') + '?q=pyt',
+        reverse('api_article_list') + '?limit=5',
+        reverse('api_article_list') + '?category=category-1&tag=python&fields=title,tags,images',
+        reverse('api_article_detail', kwargs={'slug': 'article-1'}),
+        reverse('api_tool_list'),
+        reverse('api_tool_detail', kwargs={'slug': 'tool-1'}),
+        reverse('api_resource_list'),
+        reverse('api_resource_detail', kwargs={'slug': 'resource-1'}),
+        reverse('api_category_list'),
+        reverse('api_category_detail', kwargs={'slug': 'category-1'}),
+        reverse('api_tag_list'),
+        reverse('api_tag_detail', kwargs={'slug': 'python'}),
+    ]
+
+
+@override_settings(QUERY_BUDGET_RAISE=True, RATE_LIMITS={}, PAGE_CACHE_ENABLED=False)
+class QueryBudgetTests(TestCase):
+
+    def query_counts(self, size):
+        # Measure cold lookups; test rollbacks don't fire the invalidation signals either
+        cache.clear()
+        object_cache.clear()
+        suggest.clear()
+        seed(size)
+        counts = {}
+        for url in routes():
+            with self.subTest(url=url, size=size):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                counts[url] = len(queries)
+        return counts
+
+    def test_views_stay_within_budget_and_do_not_grow_with_list_length(self):
+        small = self.query_counts(6)
+        Article.objects.all().delete()
+        Tool.objects.all().delete()
+        Resource.objects.all().delete()
+        Category.objects.all().delete()
+        large = self.query_counts(24)
+        for url, count in small.items():
+            with self.subTest(url=url):
+                self.assertEqual(large[url], count)
+
+    def test_budget_exceeded_raises(self):
+        @query_budget(max_queries=1)
+        def view(request):
+            list(Category.objects.all())
+            list(Tool.objects.all())
+
+        request = self.client.get(reverse('home')).wsgi_request
+        with self.assertRaises(QueryBudgetExceeded):
+            view(request)
+
+
+@override_settings(RATE_LIMITS={}, PAGE_CACHE_ENABLED=False)
+class ApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        object_cache.clear()
+        published_at = timezone.now()
+        self.articles = [
+            Article.objects.create(
+                title=f"Article {i}", content='<p>Secret body</p>', read_time=1,
+                # Five articles share a publication time, so the cursor needs the id
+                published_at=published_at - timedelta(days=max(i - 4, 0)),
+            )
+            for i in range(8)
+        ]
+
+    def get(self, url, status=200, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_cursor_walk_visits_every_article_once_in_order(self):
+        expected = [a.slug for a in sorted(self.articles, key=lambda a: (a.published_at, a.pk), reverse=True)]
+        slugs, url = [], reverse('api_article_list') + '?limit=2&fields=slug'
+        while url:
+            data = self.get(url).json()
+            slugs.extend(row['slug'] for row in data['results'])
+            url = data['next']
+        self.assertEqual(slugs, expected)
+
+    def test_fields_pick_the_output_and_the_loaded_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get(reverse('api_article_list') + '?fields=title').json()
+        self.assertEqual(data['results'][0], {'title': 'Article 4'})
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('"content"', sql)
+        self.assertNotIn('"rendered_content"', sql)
+        self.assertNotIn('content', self.get(reverse('api_article_list')).json()['results'][0])
+
+        detail = self.get(reverse('api_article_detail', kwargs={'slug': 'article-0'})).json()
+        self.assertEqual(detail['content'], '<p>Secret body</p>')
+
+    def test_bad_parameters_get_400(self):
+        for query in ('cursor=not-a-cursor', 'cursor=WyJ4Il0', 'fields=title,password', 'limit=many'):
+            with self.subTest(query=query):
+                response = self.get(f"{reverse('api_article_list')}?{query}", status=400)
+                self.assertIn('error', response.json())
+        self.get(reverse('api_article_detail', kwargs={'slug': 'missing'}), status=404)
+
+    def test_matching_etag_gets_304_until_the_content_changes(self):
+        url = reverse('api_article_detail', kwargs={'slug': 'article-0'})
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(url, status=304, HTTP_IF_NONE_MATCH=etag)['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.articles[0].title = 'Renamed'
+            self.articles[0].save()
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['title'], 'Renamed')
+
+
+@jobs.task('tests.store_image_size')
+def store_image_size(url, width):
+    ImageSize.objects.update_or_create(url=url, defaults={'width': width, 'height': width})
+
+
+class WorkerTests(TransactionTestCase):
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_worker_runs_jobs_one_at_a_time_on_sqlite(self):
+        for i in range(20):
+            jobs.enqueue('tests.store_image_size', {'url': f"https://img.example.com/{i % 5}.png", 'width': i})
+        out = StringIO()
+        call_command('run_worker', '--once', '--poll-interval', '0.01', stdout=out)
+        self.assertIn('concurrency 1', out.getvalue())
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_DONE).count(), 20)
+        self.assertEqual(ImageSize.objects.count(), 5)
+
+    def test_expired_attempt_does_not_overwrite_the_next_one(self):
+        jobs.enqueue('tests.store_image_size', {'url': 'https://img.example.com/a.png', 'width': 1})
+        first, = jobs.claim('worker-1', visibility_timeout=1)
+        # The lease expires and the same worker claims the job again
+        Job.objects.filter(pk=first.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        second, = jobs.claim('worker-1')
+
+        self.assertTrue(jobs.run_job(first))
+        self.assertEqual(Job.objects.get(pk=first.pk).status, Job.STATUS_RUNNING)
+        self.assertTrue(jobs.run_job(second))
+        self.assertEqual(Job.objects.get(pk=first.pk).status, Job.STATUS_DONE)
+
+    @override_settings(SURROGATE_PURGER='core.surrogate.LocalPurger')
+    def test_purges_queued_by_content_saves_reach_the_purger(self):
+        LocalPurger.purged.clear()
+        tool = Tool.objects.create(name='Tool', description='A tool')
+        call_command('run_worker', '--once', '--poll-interval', '0.01', stdout=StringIO())
+        self.assertIn(object_key(tool), LocalPurger.purged)
+        self.assertIn(list_key(Tool), LocalPurger.purged)
+
+    def test_finished_jobs_are_deleted_after_their_retention(self):
+        for status in (Job.STATUS_DONE, Job.STATUS_FAILED, Job.STATUS_QUEUED):
+            Job.objects.create(name='tests.store_image_size', status=status)
+        Job.objects.update(updated_at=timezone.now() - timedelta(days=60))
+        recent = Job.objects.create(name='tests.store_image_size', status=Job.STATUS_DONE)
+
+        self.assertEqual(jobs.delete_finished(), 2)
+        self.assertQuerySetEqual(
+            Job.objects.order_by('pk').values_list('status', flat=True),
+            [Job.STATUS_QUEUED, recent.status],
+        )
+
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    """Serves an OpenGraph page with an ETag, and 404 for every other path"""
+    page = (
+        b'<html><head><title>Plain title</title>'
+        b'<meta property="og:title" content="OG title">'
+        b'<meta property="og:description" content="OG description">'
+        b'<meta property="og:image" content="/cover.png">'
+        b'<link rel="shortcut icon" href="/static/icon.png">'
+        b'</head><body></body></html>'
+    )
+
+    utf8_page = '<html><head><meta charset="utf-8"><title>Café Ünïcode – ok</title></head></html>'.encode()
+
+    def do_GET(self):
+        self.server.requests.append((time.monotonic(), self.path, self.headers.get('If-None-Match')))
+        if self.path == '/utf8':
+            # No charset in the header: the page declares it
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.end_headers()
+            self.wfile.write(self.utf8_page)
+        elif self.path.startswith('/missing'):
+            self.send_response(404)
+            self.end_headers()
+        elif self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', str(len(self.page)))
+            self.end_headers()
+            self.wfile.write(self.page)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(LINK_PREVIEW_HOST_INTERVAL=0, LINK_PREVIEW_TTL=3600, LINK_PREVIEW_ERROR_TTL=60)
+class LinkPreviewTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PreviewHandler)
+        cls.server.requests = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests.clear()
+
+    def test_opengraph_metadata_is_stored(self):
+        url = self.base + '/tool'
+        self.assertEqual(link_previews.refresh([url]), 1)
+        preview = LinkPreview.objects.get(url=url)
+        self.assertEqual(preview.title, 'OG title')
+        self.assertEqual(preview.description, 'OG description')
+        self.assertEqual(preview.image_url, self.base + '/cover.png')
+        self.assertEqual(preview.favicon_url, self.base + '/static/icon.png')
+        self.assertEqual(preview.etag, '"v1"')
+
+    def test_page_charset_is_used_when_the_header_has_none(self):
+        url = self.base + '/utf8'
+        link_previews.refresh([url])
+        self.assertEqual(LinkPreview.objects.get(url=url).title, 'Café Ünïcode – ok')
+
+    def test_not_modified_keeps_the_stored_metadata(self):
+        url = self.base + '/tool'
+        link_previews.refresh([url])
+        self.assertEqual(link_previews.refresh([url]), 0)  # not expired yet
+        link_previews.refresh([url], force=True)
+
+        self.assertEqual(self.server.requests[-1][2], '"v1"')
+        preview = LinkPreview.objects.get(url=url)
+        self.assertEqual(preview.status_code, 304)
+        self.assertEqual(preview.title, 'OG title')
+        self.assertEqual(preview.image_url, self.base + '/cover.png')
+
+    def test_errors_expire_after_the_error_ttl(self):
+        url = self.base + '/missing'
+        link_previews.refresh([url])
+        preview = LinkPreview.objects.get(url=url)
+        self.assertEqual(preview.error, 'HTTP 404')
+        self.assertFalse(preview.is_available)
+        self.assertEqual(preview.expires_at - preview.fetched_at, timedelta(seconds=60))
+
+    @override_settings(LINK_PREVIEW_HOST_INTERVAL=0.2)
+    def test_requests_to_one_host_are_spaced_out(self):
+        link_previews.refresh([f"{self.base}/missing/{i}" for i in range(3)], workers=3)
+        times = sorted(at for at, _, _ in self.server.requests)
+        self.assertEqual(len(times), 3)
+        for earlier, later in zip(times, times[1:]):
+            self.assertGreaterEqual(later - earlier, 0.15)
+
+    def test_pages_showing_changed_previews_are_purged(self):
+        tool = Tool.objects.create(name='Tool', description='A tool', external_link=self.base + '/tool')
+        resource = Resource.objects.create(name='Resource', description='A resource', file_url=self.base + '/tool')
+        Job.objects.all().delete()
+
+        link_previews.refresh([self.base + '/tool'])
+        job = Job.objects.get(name='core.purge_surrogate_keys')
+        self.assertEqual(job.payload['keys'], sorted([object_key(tool), object_key(resource)]))
+
+        # A 304 leaves the pages as they are
+        link_previews.refresh([self.base + '/tool'], force=True)
+        self.assertEqual(Job.objects.filter(name='core.purge_surrogate_keys').count(), 1)
+
+
+@override_settings(PAGE_CACHE_ENABLED=False, RATE_LIMIT_TRUST_FORWARDED=False)
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('search') + '?q=python'
+
+    @override_settings(RATE_LIMITS={'search': {'rate': 0.01, 'burst': 2}})
+    def test_client_over_its_bucket_gets_429_with_retry_after(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        # Another client still has its own tokens
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    @override_settings(RATE_LIMITS={'search': {'rate': 100, 'burst': 100, 'global_rate': 0.01, 'global_burst': 1}})
+    def test_exhausted_global_bucket_sheds_with_503(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        response = self.client.get(self.url, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(RATE_LIMITS={'search': {'max_concurrent': 1}})
+    def test_concurrency_limit_sheds_and_releases_slots(self):
+        concurrency = ratelimit.RateLimitMiddleware.concurrency
+        self.assertTrue(concurrency.acquire('search', 1))  # a request still running
+        try:
+            self.assertEqual(self.client.get(self.url).status_code, 503)
+        finally:
+            concurrency.release('search')
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(concurrency.snapshot()['search'], 0)
+
+    @override_settings(RATE_LIMITS={'search': {'rate': 0.01, 'burst': 1}})
+    def test_staff_are_not_limited(self):
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(RATE_LIMITS={'search': {'rate': 0.01, 'burst': 1}})
+    def test_forwarded_for_is_only_used_when_trusted(self):
+        self.assertEqual(self.client.get(self.url, HTTP_X_FORWARDED_FOR='1.1.1.1').status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_X_FORWARDED_FOR='2.2.2.2').status_code, 429)
+        with self.settings(RATE_LIMIT_TRUST_FORWARDED=True):
+            self.assertEqual(self.client.get(self.url, HTTP_X_FORWARDED_FOR='3.3.3.3, 10.0.0.1').status_code, 200)
+            self.assertEqual(self.client.get(self.url, HTTP_X_FORWARDED_FOR='4.4.4.4').status_code, 200)
+            self.assertEqual(self.client.get(self.url, HTTP_X_FORWARDED_FOR='3.3.3.3').status_code, 429)
+
+    @override_settings(RATE_LIMITS={'search': {'rate': 0.01, 'burst': 1}})
+    def test_outcomes_are_counted_and_shown_to_staff(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(ratelimit.stats(), {'search': {'allowed': 1, 'limited': 1, 'shed': 0}})
+
+        status_url = reverse('rate_limit_status')
+        self.assertEqual(self.client.get(status_url).status_code, 302)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        data = self.client.get(status_url).json()
+        self.assertEqual(data['counters']['search'], {'allowed': 1, 'limited': 1, 'shed': 0})
+        self.assertIn('in_flight', data)
+
+
+@override_settings(ANALYTICS_FLUSH_SIZE=1000, ANALYTICS_FLUSH_INTERVAL=3600)
+class AnalyticsTests(TestCase):
+    DAY = date(2024, 5, 15)  # a Wednesday
+
+    def setUp(self):
+        analytics.flush()
+
+    def views(self, **filters):
+        return {
+            (row.dimension, row.object_id): (row.views, row.label)
+            for row in ViewStat.objects.filter(**filters)
+        }
+
+    def day_row(self, object_id, label, day, views, dimension=ViewStat.DIMENSION_ARTICLE):
+        ViewStat.objects.create(
+            dimension=dimension, object_id=object_id, label=label, period=ViewStat.PERIOD_DAY, period_start=day, views=views,
+        )
+
+    def test_buffered_views_are_added_to_the_day_rows(self):
+        category = Category.objects.create(name='News')
+        article = Article.objects.create(title='Post', content='<p>x</p>', category=category, read_time=1, published_at=timezone.now())
+        article.tags.add('python')
+        article = Article.objects.select_related('category').prefetch_related('tags').get(pk=article.pk)
+        tag = article.tags.get()
+
+        for _ in range(2):
+            analytics.record_view(analytics.dimensions(article))
+        self.assertFalse(ViewStat.objects.exists())
+        self.assertEqual(analytics.flush(), 3)
+        analytics.record_view(analytics.dimensions(article))
+        analytics.flush()
+
+        self.assertEqual(self.views(period=ViewStat.PERIOD_DAY), {
+            (ViewStat.DIMENSION_ARTICLE, article.pk): (3, 'Post'),
+            (ViewStat.DIMENSION_CATEGORY, category.pk): (3, 'News'),
+            (ViewStat.DIMENSION_TAG, tag.pk): (3, 'python'),
+        })
+
+    def test_rollup_is_idempotent_and_keeps_the_latest_label(self):
+        self.day_row(1, 'Zebra', self.DAY - timedelta(days=1), 4)
+        self.day_row(1, 'Apple', self.DAY, 6)  # renamed
+        self.day_row(2, 'Other', self.DAY, 1)
+
+        analytics.rollup(self.DAY)
+        analytics.rollup(self.DAY)
+
+        expected = {(ViewStat.DIMENSION_ARTICLE, 1): (10, 'Apple'), (ViewStat.DIMENSION_ARTICLE, 2): (1, 'Other')}
+        self.assertEqual(self.views(period=ViewStat.PERIOD_WEEK, period_start=date(2024, 5, 13)), expected)
+        self.assertEqual(self.views(period=ViewStat.PERIOD_MONTH, period_start=date(2024, 5, 1)), expected)
+        self.assertEqual(
+            analytics.top(ViewStat.DIMENSION_ARTICLE, self.DAY - timedelta(days=7)),
+            [{'object_id': 1, 'total': 10, 'last_label': 'Apple'}, {'object_id': 2, 'total': 1, 'last_label': 'Other'}],
+        )
+
+    @override_settings(ANALYTICS_RETENTION_DAYS={'day': 90, 'week': 730, 'month': None})
+    def test_retention_deletes_old_rows_per_period(self):
+        self.day_row(1, 'Old', self.DAY - timedelta(days=91), 1)
+        self.day_row(1, 'Recent', self.DAY - timedelta(days=89), 1)
+        for period, start in ((ViewStat.PERIOD_WEEK, date(2021, 1, 4)), (ViewStat.PERIOD_MONTH, date(2015, 1, 1))):
+            ViewStat.objects.create(dimension=ViewStat.DIMENSION_ARTICLE, object_id=1, period=period, period_start=start, views=1)
+
+        self.assertEqual(analytics.apply_retention(self.DAY), 2)
+        self.assertEqual(
+            sorted(ViewStat.objects.values_list('period', 'label')),
+            [(ViewStat.PERIOD_DAY, 'Recent'), (ViewStat.PERIOD_MONTH, '')],
+        )
+
+    def test_rollup_command(self):
+        # Recent enough to survive the retention the command applies afterwards
+        today = timezone.localdate()
+        self.day_row(1, 'Post', today, 2)
+        out = StringIO()
+        call_command('rollup_analytics', '--date', today.isoformat(), '--days', '1', stdout=out)
+        self.assertIn(f"Rolled up {today}", out.getvalue())
+        self.assertEqual(ViewStat.objects.get(period=ViewStat.PERIOD_WEEK).views, 2)
+
+    def test_dashboard_months_cover_twelve_calendar_months(self):
+        self.assertEqual(ViewStatAdmin.since(12, ViewStat.PERIOD_MONTH, date(2026, 10, 19)), date(2025, 11, 1))
+        self.assertEqual(ViewStatAdmin.since(12, ViewStat.PERIOD_MONTH, date(2026, 12, 31)), date(2026, 1, 1))
+        self.assertEqual(ViewStatAdmin.since(7, ViewStat.PERIOD_DAY, date(2026, 10, 19)), date(2026, 10, 13))
+
+
+# Views for PageCacheTests, served with ROOT_URLCONF='core.tests'
+
+page_renders = []
+page_hits = []
+
+
+def count_page_hit(name):
+    page_hits.append(name)
+
+
+@cache_policy(max_age=0, s_maxage=60)
+def cached_page(request):
+    page_renders.append(request.get_full_path())
+    if request.GET.get('purge'):
+        page_cache.invalidate(['other'])
+    if request.GET.get('stale'):
+        page_cache.mark_stale()
+    response = HttpResponse('<p>Page</p>' + 'x' * 500)
+    page_cache.on_hit(response, 'core.tests.count_page_hit', 'page')
+    return add_surrogate_keys(response, 'page')
+
+
+@cache_policy(max_age=0, s_maxage=60)
+def language_page(request):
+    response = HttpResponse(request.META.get('HTTP_ACCEPT_LANGUAGE', ''))
+    patch_vary_headers(response, ['Accept-Language'])
+    return add_surrogate_keys(response, 'page')
+
+
+urlpatterns = [
+    path('page/', cached_page),
+    path('language/', language_page),
+]
+
+
+@override_settings(ROOT_URLCONF='core.tests', PAGE_CACHE_ENABLED=True, RATE_LIMITS={})
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        page_renders.clear()
+        page_hits.clear()
+
+    def get(self, url='/page/', **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_hits_use_a_precompressed_body_for_the_accepted_encoding(self):
+        self.assertEqual(self.get(HTTP_ACCEPT_ENCODING='gzip')['X-Page-Cache'], 'miss')
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(gzip.decompress(response.content).startswith(b'<p>Page</p>'))
+
+        for accept in ('', 'gzip;q=0', 'identity'):
+            response = self.get(HTTP_ACCEPT_ENCODING=accept)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertTrue(response.content.startswith(b'<p>Page</p>'))
+        self.assertEqual(len(page_renders), 1)
+
+    def test_vary_headers_keep_a_page_per_variant(self):
+        self.assertEqual(self.get('/language/', HTTP_ACCEPT_LANGUAGE='en')['X-Page-Cache'], 'miss')
+        self.assertEqual(self.get('/language/', HTTP_ACCEPT_LANGUAGE='fr')['X-Page-Cache'], 'miss')
+        response = self.get('/language/', HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual((response['X-Page-Cache'], response.content), ('hit', b'en'))
+        response = self.get('/language/', HTTP_ACCEPT_LANGUAGE='fr')
+        self.assertEqual((response['X-Page-Cache'], response.content), ('hit', b'fr'))
+
+    def test_requests_with_a_session_bypass_the_cache(self):
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'session'
+        self.assertFalse(self.get().has_header('X-Page-Cache'))
+        self.assertFalse(self.get().has_header('X-Page-Cache'))
+        self.assertEqual(len(page_renders), 2)
+
+    def test_purging_a_surrogate_key_outdates_its_pages(self):
+        self.get()
+        page_cache.invalidate(['other'])
+        self.assertEqual(self.get()['X-Page-Cache'], 'hit')
+        page_cache.invalidate(['page'])
+        self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+        self.assertEqual(len(page_renders), 2)
+
+    def test_conditional_requests_get_304(self):
+        etag = self.get()['ETag']
+        response = self.client.get('/page/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['X-Page-Cache']), (304, 'hit'))
+
+    def test_hit_callbacks_run_on_every_hit(self):
+        for _ in range(3):
+            self.get()
+        self.assertEqual(page_hits, ['page', 'page'])
+
+    @override_settings(ROOT_URLCONF='pezawebsite.urls')
+    def test_article_views_are_counted_on_hits(self):
+        article = Article.objects.create(title='Counted', content='<p>Text</p>', read_time=1, published_at=timezone.now())
+        url = reverse('article_detail', kwargs={'slug': article.slug})
+        statuses = [self.client.get(url)['X-Page-Cache'] for _ in range(3)]
+        self.assertEqual(statuses, ['miss', 'hit', 'hit'])
+        article.refresh_from_db()
+        self.assertEqual(article.views, 3)
+
+    def test_pages_stay_fresh_for_their_s_maxage(self):
+        self.get()
+        entry = cache.get(page_cache._url_key(self.client.get('/page/').wsgi_request))
+        page, = entry['pages'].values()
+        self.assertAlmostEqual(page['expires'] - time.time(), 60, delta=2)
+
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+        self.assertEqual(len(page_renders), 2)
+
+    def test_pages_rendered_while_a_purge_happens_are_not_stored(self):
+        self.assertFalse(self.get('/page/?purge=1').has_header('X-Page-Cache'))
+        self.get('/page/?purge=1')
+        self.assertEqual(len(page_renders), 2)
+
+    def test_pages_using_stale_values_are_not_stored(self):
+        self.assertFalse(self.get('/page/?stale=1').has_header('X-Page-Cache'))
+        self.get('/page/?stale=1')
+        self.assertEqual(len(page_renders), 2)
+
+
+class ObjectCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        object_cache.clear()
+        self.article = Article.objects.create(title='Cached', content='<p>Text</p>', read_time=1, published_at=timezone.now())
+
+    def get(self):
+        return object_cache.get_object_or_404(Article.objects.all(), self.article.slug)
+
+    def test_invalidation_waits_for_the_commit(self):
+        self.get()
+        version = page_cache.versions([object_key(self.article)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.title = 'Renamed'
+            self.article.save()
+            # Another request would cache the committed row again until then
+            self.assertEqual(self.get().title, 'Cached')
+            self.assertEqual(page_cache.versions([object_key(self.article)]), version)
+        self.assertEqual(self.get().title, 'Renamed')
+        self.assertNotEqual(page_cache.versions([object_key(self.article)]), version)
+
+    def test_renders_that_may_be_stored_skip_the_local_tier(self):
+        self.get()
+        # Renamed by another process: the shared tier was invalidated, this process' LRU wasn't
+        Article.objects.filter(pk=self.article.pk).update(title='Renamed')
+        cache.delete(object_cache.cache_key(Article, self.article.slug))
+        self.assertEqual(self.get().title, 'Cached')
+
+        token = page_cache._rendering.set({'stale': False})
+        try:
+            self.assertEqual(self.get().title, 'Renamed')
+        finally:
+            page_cache._rendering.reset(token)
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def compute(self, value='new', delay=0):
+        def compute():
+            self.calls.append(value)
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_concurrent_misses_compute_once(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(single_flight.get_or_set('key', self.compute(delay=0.2), 60)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['new'] * 5)
+        self.assertEqual(self.calls, ['new'])
+
+    def test_a_new_version_recomputes(self):
+        self.assertEqual(single_flight.get_or_set('key', self.compute('a'), 60, version=1), 'a')
+        self.assertEqual(single_flight.get_or_set('key', self.compute('b'), 60, version=1), 'a')
+        self.assertEqual(single_flight.get_or_set('key', self.compute('b'), 60, version=2), 'b')
+        self.assertEqual(self.calls, ['a', 'b'])
+
+    def test_outdated_values_are_served_stale_while_another_caller_refreshes(self):
+        stale = []
+        single_flight.get_or_set('key', self.compute('old'), 60, version=1)
+        self.assertTrue(single_flight.acquire('key'))
+        try:
+            value = single_flight.get_or_set('key', self.compute(), 60, version=2, on_stale=lambda: stale.append(1))
+        finally:
+            single_flight.release('key')
+        self.assertEqual((value, stale), ('old', [1]))
+        self.assertEqual(single_flight.get_or_set('key', self.compute(), 60, version=2, on_stale=lambda: stale.append(1)), 'new')
+        self.assertEqual(stale, [1])
+
+    def test_early_refreshes_are_not_stale(self):
+        stale = []
+        single_flight.get_or_set('key', self.compute('old'), 60)
+        self.assertTrue(single_flight.acquire('key'))
+        try:
+            with mock.patch('core.single_flight.should_refresh', return_value=True):
+                value = single_flight.get_or_set('key', self.compute(), 60, on_stale=lambda: stale.append(1))
+        finally:
+            single_flight.release('key')
+        self.assertEqual((value, stale), ('old', []))
+
+    def test_should_refresh_comes_earlier_for_slow_values(self):
+        self.assertFalse(single_flight.should_refresh(10, expires=105, beta=0, now=100))
+        self.assertTrue(single_flight.should_refresh(10, expires=100, beta=0, now=100))
+        # -log(0.5) is about 0.69, so the refresh comes about 0.69 * delta * beta seconds early
+        with mock.patch('random.random', return_value=0.5):
+            self.assertTrue(single_flight.should_refresh(10, expires=105, beta=1, now=100))
+            self.assertFalse(single_flight.should_refresh(1, expires=105, beta=1, now=100))
+            self.assertTrue(single_flight.should_refresh(1, expires=105, beta=10, now=100))
+
+    def test_shared_fragments_mark_the_render_stale(self):
+        views._shared('fragment', self.compute('old'), 60, key='fragment-key')
+        page_cache.invalidate(['fragment-key'])
+        self.assertTrue(single_flight.acquire('fragment:fragment'))
+        state = {'stale': False}
+        token = page_cache._rendering.set(state)
+        try:
+            self.assertEqual(views._shared('fragment', self.compute(), 60, key='fragment-key'), 'old')
+        finally:
+            page_cache._rendering.reset(token)
+            single_flight.release('fragment:fragment')
+        self.assertTrue(state['stale'])
+
+
+@override_settings(SUGGEST_VERSION_CHECK=0)
+class SuggestTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        suggest.clear()
+        Tool.objects.create(name='Django Debug Toolbar', description='Panels')
+        Tool.objects.create(name='Café Django', description='Coffee')
+        Tool.objects.create(name='Getting started with Django', description='Intro')
+
+    def labels(self, query):
+        return [result['label'] for result in suggest.suggestions(query)]
+
+    def test_word_prefixes_match_and_label_starts_come_first(self):
+        self.assertEqual(
+            self.labels('dja'), ['Django Debug Toolbar', 'Café Django', 'Getting started with Django'],
+        )
+        self.assertEqual(self.labels('cafe'), ['Café Django'])
+        self.assertEqual(self.labels('d'), [])
+
+    def test_changes_made_here_do_not_rebuild(self):
+        index = suggest.get_index()
+        with mock.patch('core.suggest.build', side_effect=AssertionError('rebuilt')):
+            tool = Tool.objects.create(name='Djangorestframework', description='API')
+            self.assertIn('Djangorestframework', self.labels('djangor'))
+            tool.delete()
+            self.assertEqual(self.labels('djangor'), [])
+        self.assertIs(suggest.get_index(), index)
+
+    def test_changes_logged_by_other_processes_are_applied(self):
+        index = suggest.get_index()
+        cafe = Tool.objects.get(name='Café Django')
+        # Other processes' changes: logged, not applied to this process's index
+        suggest._log('add', suggest.Entry('tool', 999, 'Djangorestframework', '/tools/drf/'))
+        suggest._log('remove', ('tool', cafe.pk))
+        with mock.patch('core.suggest.build', side_effect=AssertionError('rebuilt')):
+            self.assertEqual(self.labels('djangor'), ['Djangorestframework'])
+            self.assertEqual(self.labels('cafe'), [])
+        self.assertIs(suggest.get_index(), index)
+
+    def test_missing_changes_rebuild_the_index(self):
+        index = suggest.get_index()
+        suggest._log('add', suggest.Entry('tool', 999, 'Djangorestframework', '/tools/drf/'))
+        cache.delete(suggest.CHANGE_PREFIX + str(cache.get(suggest.SEQUENCE_KEY)))
+        self.assertEqual(self.labels('djangor'), [])
+        self.assertIsNot(suggest.get_index(), index)
+
+    def test_a_sequence_number_taken_twice_starts_a_new_epoch(self):
+        index = suggest.get_index()
+        with mock.patch.object(cache, 'incr', return_value=1):
+            suggest._log('add', suggest.Entry('tool', 998, 'Djangoa', '/tools/a/'))
+            suggest._log('add', suggest.Entry('tool', 999, 'Djangob', '/tools/b/'))
+        self.assertIsNotNone(cache.get(suggest.EPOCH_KEY))
+        self.assertIsNot(suggest.get_index(), index)
+
+
+class ArchiveMonthTests(TestCase):
+
+    def counts(self):
+        return {(row.year, row.month): row.count for row in ArchiveMonth.objects.filter(count__gt=0)}
+
+    def article(self, title, published_at):
+        return Article.objects.create(title=title, content='<p>Text</p>', read_time=1, published_at=published_at)
+
+    def test_counts_follow_create_redate_and_delete(self):
+        march = timezone.make_aware(timezone.datetime(2024, 3, 10))
+        april = timezone.make_aware(timezone.datetime(2024, 4, 2))
+        first = self.article('First', march)
+        second = self.article('Second', march)
+        self.assertEqual(self.counts(), {(2024, 3): 2})
+
+        second.published_at = april
+        second.save()
+        self.assertEqual(self.counts(), {(2024, 3): 1, (2024, 4): 1})
+
+        # Saving without moving to another month changes nothing
+        first.published_at = march + timedelta(days=5)
+        first.save()
+        self.assertEqual(self.counts(), {(2024, 3): 1, (2024, 4): 1})
+
+        first.delete()
+        self.assertEqual(self.counts(), {(2024, 4): 1})
+
+        incremental = self.counts()
+        archive.rebuild()
+        self.assertEqual(self.counts(), incremental)
+
+
+@override_settings(
+    CONTENT_IMAGE_RESIZE_URL='https://img.example.com/{width}/{url}', CONTENT_IMAGE_MAX_WIDTH=800,
+    PAGE_CACHE_ENABLED=False, RATE_LIMITS={},
+)
+class ArticleImageTests(TestCase):
+    WIDE = 'https://example.com/wide.png'
+    SMALL = 'https://example.com/small.png'
+
+    def setUp(self):
+        cache.clear()
+        object_cache.clear()
+        ImageSize.objects.create(url=self.WIDE, width=1600, height=900)
+        self.article = Article.objects.create(
+            title='Gallery', content=f'<p>Intro</p><img src="{self.WIDE}"><img src="{self.SMALL}">',
+            read_time=1, published_at=timezone.now(),
+        )
+
+    def test_gallery_is_extracted_on_save(self):
+        self.assertEqual(self.article.first_image_url, self.WIDE)
+        self.assertEqual(self.article.content_images, [
+            {'src': f'https://img.example.com/800/{self.WIDE}', 'url': self.WIDE, 'width': '800', 'height': '450'},
+            {'src': f'https://img.example.com/800/{self.SMALL}', 'url': self.SMALL, 'width': '', 'height': ''},
+        ])
+
+        # Sizes probed later reach the gallery with the re-render
+        ImageSize.objects.create(url=self.SMALL, width=400, height=300)
+        self.article.save(update_fields=['rendered_content'])
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.content_images[1]['width'], '400')
+
+    def test_article_page_shows_the_stored_gallery_without_parsing_content(self):
+        with mock.patch('bs4.BeautifulSoup', side_effect=AssertionError('content parsed per request')):
+            response = self.client.get(reverse('article_detail', kwargs={'slug': self.article.slug}))
+        self.assertEqual(response.context['image_count'], 2)
+        self.assertContains(
+            response,
+            f'<img src="https://img.example.com/800/{self.WIDE}" alt="Article image 1" loading="lazy" '
+            'decoding="async" width="800" height="450">',
+        )
+        self.assertContains(response, f'<a href="{self.SMALL}" target="_blank" class="image-overlay">')
+
+
+class ImageRewriteTests(TestCase):
+    OLD = 'https://old.example.com/a.png?w=1&h=2'
+    NEW = 'https://new.example.com/a.png?w=1&h=2'
+
+    def article(self, title, src):
+        return Article.objects.create(
+            title=title, content=f'<p>Intro</p><img src="{src}">', read_time=1, published_at=timezone.now(),
+        )
+
+    def test_rewrites_escaped_urls_and_moves_only_changed_articles(self):
+        escaped = self.article('Escaped', self.OLD.replace('&', '&amp;'))
+        # A form the rewrite doesn't match: left as it is, and still indexed under the old URL
+        numeric = self.article('Numeric', self.OLD.replace('&', '&#38;'))
+        ArticleImage.objects.create(article=numeric, image_url=self.OLD)
+        self.assertQuerySetEqual(image_index.articles_using(self.OLD).order_by('title'), [escaped, numeric])
+
+        self.assertEqual(image_index.rewrite({self.OLD: self.NEW}), 2)
+
+        escaped.refresh_from_db()
+        self.assertIn(self.NEW.replace('&', '&amp;'), escaped.content)
+        self.assertIn('new.example.com', escaped.rendered_content)
+        self.assertEqual(escaped.first_image_url, self.NEW)
+        numeric.refresh_from_db()
+        self.assertIn('old.example.com', numeric.content)
+        self.assertEqual(numeric.images.get().image_url, self.NEW)
+
+        self.assertQuerySetEqual(image_index.articles_using(self.NEW).order_by('title'), [escaped, numeric])
+        self.assertQuerySetEqual(image_index.articles_using(self.OLD), [numeric])
+        self.assertTrue(Image.objects.filter(url=self.OLD).exists())
+
+    def test_unused_old_urls_are_dropped_from_the_index(self):
+        article = self.article('Plain', 'https://old.example.com/b.png')
+        self.assertEqual(image_index.rewrite({'https://old.example.com/b.png': 'https://new.example.com/b.png'}), 1)
+        self.assertQuerySetEqual(image_index.articles_using('https://new.example.com/b.png'), [article])
+        self.assertFalse(Image.objects.filter(url='https://old.example.com/b.png').exists())
+
+
+class EarlyHintsTests(SimpleTestCase):
+
+    def sent(self, path, method='GET'):
+        messages = []
+
+        async def application(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200})
+
+        async def send(message):
+            messages.append(message['type'])
+
+        scope = {
+            'type': 'http', 'method': method, 'path': path,
+            'extensions': {'http.response.early_hint': {}},
+        }
+        async_to_sync(preload.early_hints(application))(scope, None, send)
+        return messages
+
+    def test_only_html_pages_get_early_hints(self):
+        hinted = ['http.response.early_hint', 'http.response.start']
+        self.assertEqual(self.sent('/'), hinted)
+        self.assertEqual(self.sent(reverse('article_detail', kwargs={'slug': 'any'})), hinted)
+        for path in (
+            reverse('api_article_list'), reverse('search_suggestions'), reverse('rate_limit_status'),
+            '/admin/', '/no/such/page/', settings.STATIC_URL + 'site.css',
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.sent(path), ['http.response.start'])
+        self.assertEqual(self.sent('/', method='POST'), ['http.response.start'])
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """A fresh worker must boot quickly and leave heavy packages for first use"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.profile = startup.measure(urls=True, settings_module='pezawebsite.settings')
+
+    def test_setup_time_within_budget(self):
+        self.assertLess(self.profile.setup_seconds, settings.STARTUP_TIME_BUDGET)
+
+    def test_heavy_modules_are_not_imported_at_startup(self):
+        self.assertEqual(self.profile.loaded(settings.STARTUP_LAZY_MODULES), [])
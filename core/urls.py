@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Home
@@ -21,4 +21,24 @@ urlpatterns = [
     path('category/<slug:slug>/', views.articles_by_category, name='articles_by_category'),
     path('tag/<slug:tag>/', views.articles_by_tag, name='articles_by_tag'),
     path('search/', views.search_view, name='search'),
+    path('search/suggest/', views.search_suggestions_view, name='search_suggestions'),
+
+    # Archive
+    path('archive/<int:year>/', views.article_archive_view, name='article_archive_year'),
+    path('archive/<int:year>/<int:month>/', views.article_archive_view, name='article_archive_month'),
+
+    # JSON API (read-only)
+    path('api/v1/articles/', api.article_list, name='api_article_list'),
+    path('api/v1/articles/<slug:slug>/', api.article_detail, name='api_article_detail'),
+    path('api/v1/categories/', api.category_list, name='api_category_list'),
+    path('api/v1/categories/<slug:slug>/', api.category_detail, name='api_category_detail'),
+    path('api/v1/tags/', api.tag_list, name='api_tag_list'),
+    path('api/v1/tags/<slug:slug>/', api.tag_detail, name='api_tag_detail'),
+    path('api/v1/tools/', api.tool_list, name='api_tool_list'),
+    path('api/v1/tools/<slug:slug>/', api.tool_detail, name='api_tool_detail'),
+    path('api/v1/resources/', api.resource_list, name='api_resource_list'),
+    path('api/v1/resources/<slug:slug>/', api.resource_detail, name='api_resource_detail'),
+
+    # Monitoring
+    path('status/rate-limits/', views.rate_limit_status_view, name='rate_limit_status'),
 ]
@@ -1,14 +1,72 @@
-from django.shortcuts import render, get_object_or_404
-from django.db.models import F
-from .models import Article, Tool, Resource, Category
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+from django.db.models import Exists, F, OuterRef
+from .archive import month_range
+from .link_previews import previews_for
+from . import analytics, object_cache, page_cache, preload, ratelimit, single_flight, suggest
+from .models import Article, Tool, Resource, Category, ArchiveMonth
+from .query_budget import query_budget
+from .surrogate import (
+    NAV_KEY, add_surrogate_keys, cache_policy, category_key, list_key, object_key, tag_key,
+)
+
+
+def _shared(name, compute, ttl, key):
+    """
+    A fragment shared by many pages, regenerated by one request at a time and
+    refreshed when the content behind surrogate key ``key`` changes. A page
+    rendered with a stale fragment isn't stored in the page cache.
+    """
+    version = page_cache.versions([key]).get(key)
+    return single_flight.get_or_set(
+        f"fragment:{name}", compute, ttl, version=version, on_stale=page_cache.mark_stale,
+    )
+
+
+def _popular_posts():
+    return _shared(
+        'popular-posts',
+        lambda: list(Article.objects.prefetch_related('images').order_by('-views')[:4]),
+        ttl=60, key=list_key(Article),
+    )
+
+
+def _nav_categories():
+    """Categories for the footer, flagged with whether they have content in one query"""
+    return _shared(
+        'nav-categories',
+        lambda: list(Category.objects.annotate(
+            has_articles=Exists(Article.objects.filter(category=OuterRef('pk'))),
+            has_tools=Exists(Tool.objects.filter(category=OuterRef('pk'))),
+            has_resources=Exists(Resource.objects.filter(category=OuterRef('pk'))),
+        )),
+        ttl=600, key=NAV_KEY,
+    )
+
+
+def _page_keys(popular_posts, *keys):
+    """Surrogate keys shared by every page: navigation and the popular sidebar"""
+    return [NAV_KEY, *(object_key(post) for post in popular_posts), *keys]
+
+
+def count_article_view(article_id, dimensions):
+    """
+    Count one view of an article and its ``analytics.dimensions``.
+    Also runs for page-cache hits of the article page.
+    """
+    Article.objects.filter(pk=article_id).update(views=F('views') + 1)
+    analytics.record_view(dimensions)
 
 
 # 🏠 Home Page
+@cache_policy(max_age=60, s_maxage=600)
+@query_budget(max_queries=8, max_db_ms=200)
 def home_view(request):
-    articles = Article.objects.filter(is_tutorial=True).order_by('-published_at')[:4]
-    featured_article = Article.objects.filter(is_featured=True).first()
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    articles = Article.objects.filter(is_tutorial=True).select_related('category').prefetch_related('images').order_by('-published_at')[:4]
+    featured_article = Article.objects.filter(is_featured=True).select_related('category').prefetch_related('images').first()
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     context = {
         'articles': articles,
@@ -16,104 +74,131 @@ def home_view(request):
         'popular_posts': popular_posts,
         'categories': categories,
     }
-    return render(request, 'index.html', context)
+    response = render(request, 'index.html', context)
+    preload.add_preload_links(response, preload.image(featured_article.banner_image if featured_article else None))
+    return add_surrogate_keys(response, *_page_keys(popular_posts, list_key(Article)))
 
 
 # 📘 Tutorials Page
+@cache_policy(max_age=60, s_maxage=600)
+@query_budget(max_queries=6, max_db_ms=200)
 def tutorials_view(request):
-    tutorials = Article.objects.filter(is_tutorial=True).order_by('-published_at')
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    tutorials = Article.objects.filter(is_tutorial=True).select_related('category').prefetch_related('images').order_by('-published_at')
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     context = {
         'tutorials': tutorials,
         'popular_posts': popular_posts,
         'categories': categories,
     }
-    return render(request, 'tutorials.html', context)
+    response = render(request, 'tutorials.html', context)
+    return add_surrogate_keys(response, *_page_keys(popular_posts, list_key(Article)))
 
 
 # 📰 Blog Page
+@cache_policy(max_age=60, s_maxage=600)
+@query_budget(max_queries=6, max_db_ms=200)
 def blog_view(request):
-    posts = Article.objects.filter(is_tutorial=False).order_by('-published_at')
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    posts = Article.objects.filter(is_tutorial=False).select_related('category').prefetch_related('images').order_by('-published_at')
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     context = {
         'posts': posts,
         'popular_posts': popular_posts,
         'categories': categories,
     }
-    return render(request, 'blogs.html', context)
+    response = render(request, 'blogs.html', context)
+    return add_surrogate_keys(response, *_page_keys(popular_posts, list_key(Article)))
 
 
 # 🧰 Tools Page
+@cache_policy(max_age=60, s_maxage=3600)
+@query_budget(max_queries=5, max_db_ms=200)
 def tools_view(request):
-    tools = Tool.objects.all().order_by('name')
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    tools = Tool.objects.select_related('category').order_by('name')
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     context = {
         'tools': tools,
         'popular_posts': popular_posts,
         'categories': categories,
     }
-    return render(request, 'tools.html', context)
+    response = render(request, 'tools.html', context)
+    return add_surrogate_keys(response, *_page_keys(popular_posts, list_key(Tool)))
 
 
 # 📚 Resources Page
+@cache_policy(max_age=60, s_maxage=3600)
+@query_budget(max_queries=5, max_db_ms=200)
 def resources_view(request):
-    resources = Resource.objects.all().order_by('name')
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    resources = Resource.objects.select_related('category').order_by('name')
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     context = {
         'resources': resources,
         'popular_posts': popular_posts,
         'categories': categories,
     }
-    return render(request, 'resources.html', context)
+    response = render(request, 'resources.html', context)
+    return add_surrogate_keys(response, *_page_keys(popular_posts, list_key(Resource)))
 
 
 # 📝 Article Detail Page (UPDATED WITH IMAGE CONTEXT)
+@cache_policy(max_age=60, s_maxage=3600)
+@query_budget(max_queries=12, max_db_ms=200)
 def article_detail_view(request, slug):
-    article = get_object_or_404(Article, slug=slug)
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    article = object_cache.get_object_or_404(
+        Article.objects.select_related('category').prefetch_related('images', 'tags'), slug=slug
+    )
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     # Increment views safely
-    Article.objects.filter(pk=article.pk).update(views=F('views') + 1)
-    article.refresh_from_db()
+    dimensions = analytics.dimensions(article)
+    count_article_view(article.pk, dimensions)
+    article.refresh_from_db(fields=['views'])
     
-    # Get image data for the article
-    content_images = article.get_content_images()
+    # Get image data for the article, extracted when it was saved
+    content_images = article.content_images
     featured_image = article.featured_image
     has_images = article.has_images()
-    image_count = article.count_content_images()
+    image_count = len(content_images)
     
     # Get related articles (same category, exclude current)
     related_articles = Article.objects.filter(
         category=article.category
-    ).exclude(pk=article.pk).order_by('-published_at')[:3]
+    ).exclude(pk=article.pk).prefetch_related('images').order_by('-published_at')[:3]
     
     context = {
         'article': article,
         'popular_posts': popular_posts,
         'categories': categories,
-        'content_images': content_images,  # All images from content
+        'content_images': content_images,  # Rendered images from content, for the gallery
         'featured_image': featured_image,  # Banner or first content image
         'has_images': has_images,          # Boolean
         'image_count': image_count,        # Number of images in content
         'related_articles': related_articles,
     }
-    return render(request, 'article_detail.html', context)
+    response = render(request, 'article_detail.html', context)
+    preload.add_preload_links(response, preload.image(featured_image))
+    page_cache.on_hit(response, 'core.views.count_article_view', article.pk, dimensions)
+    return add_surrogate_keys(
+        response,
+        *_page_keys(popular_posts, object_key(article), category_key(Article, article.category_id)),
+    )
 
 
 # 🔧 Tool Detail Page
+@cache_policy(max_age=60, s_maxage=3600)
+@query_budget(max_queries=6, max_db_ms=200)
 def tool_detail_view(request, slug):
-    tool = get_object_or_404(Tool, slug=slug)
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    tool = object_cache.get_object_or_404(Tool.objects.select_related('category'), slug=slug)
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     # Get related tools (same category, exclude current)
     related_tools = Tool.objects.filter(
@@ -125,15 +210,22 @@ def tool_detail_view(request, slug):
         'popular_posts': popular_posts,
         'categories': categories,
         'related_tools': related_tools,
+        'link_previews': previews_for(tool.external_link),
     }
-    return render(request, 'tool_detail.html', context)
+    response = render(request, 'tool_detail.html', context)
+    return add_surrogate_keys(
+        response,
+        *_page_keys(popular_posts, object_key(tool), category_key(Tool, tool.category_id)),
+    )
 
 
 # 📁 Resource Detail Page
+@cache_policy(max_age=60, s_maxage=3600)
+@query_budget(max_queries=6, max_db_ms=200)
 def resource_detail_view(request, slug):
-    resource = get_object_or_404(Resource, slug=slug)
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    resource = object_cache.get_object_or_404(Resource.objects.select_related('category'), slug=slug)
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     # Get related resources (same category, exclude current)
     related_resources = Resource.objects.filter(
@@ -145,16 +237,23 @@ def resource_detail_view(request, slug):
         'popular_posts': popular_posts,
         'categories': categories,
         'related_resources': related_resources,
+        'link_previews': previews_for(resource.external_link, resource.file_url),
     }
-    return render(request, 'resource_detail.html', context)
+    response = render(request, 'resource_detail.html', context)
+    return add_surrogate_keys(
+        response,
+        *_page_keys(popular_posts, object_key(resource), category_key(Resource, resource.category_id)),
+    )
 
 
 # 🏷️ Articles by Category
+@cache_policy(max_age=60, s_maxage=1800)
+@query_budget(max_queries=7, max_db_ms=200)
 def articles_by_category(request, slug):
-    category = get_object_or_404(Category, slug=slug)
-    articles = Article.objects.filter(category=category).order_by('-published_at')
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    category = object_cache.get_object_or_404(Category.objects.all(), slug=slug)
+    articles = Article.objects.filter(category=category).select_related('category').prefetch_related('images').order_by('-published_at')
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     context = {
         'category': category,
@@ -162,16 +261,22 @@ def articles_by_category(request, slug):
         'popular_posts': popular_posts,
         'categories': categories,
     }
-    return render(request, 'category_articles.html', context)
+    response = render(request, 'category_articles.html', context)
+    return add_surrogate_keys(
+        response,
+        *_page_keys(popular_posts, object_key(category), category_key(Article, category.pk)),
+    )
 
 
 # 🏷️ Articles by Tag
+@cache_policy(max_age=60, s_maxage=1800)
+@query_budget(max_queries=8, max_db_ms=200)
 def articles_by_tag(request, tag):
     from taggit.models import Tag
-    tag_obj = get_object_or_404(Tag, slug=tag)
-    articles = Article.objects.filter(tags__slug=tag).order_by('-published_at')
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    tag_obj = object_cache.get_object_or_404(Tag.objects.all(), slug=tag)
+    articles = Article.objects.filter(tags__slug=tag).select_related('category').prefetch_related('images').order_by('-published_at')
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     context = {
         'tag': tag_obj,
@@ -179,10 +284,46 @@ def articles_by_tag(request, tag):
         'popular_posts': popular_posts,
         'categories': categories,
     }
-    return render(request, 'tag_articles.html', context)
+    response = render(request, 'tag_articles.html', context)
+    return add_surrogate_keys(response, *_page_keys(popular_posts, tag_key(tag_obj.slug)))
+
+
+# 🗓️ Article Archive (year or month)
+@cache_policy(max_age=60, s_maxage=1800)
+@query_budget(max_queries=7, max_db_ms=200)
+def article_archive_view(request, year, month=None):
+    if month is not None and not 1 <= month <= 12:
+        raise Http404("Invalid month")
+    try:
+        start, end = month_range(year, month)
+    except (ValueError, OverflowError):
+        raise Http404("Invalid year")
+
+    articles = Article.objects.filter(
+        published_at__gte=start, published_at__lt=end
+    ).select_related('category').prefetch_related('images').order_by('-published_at')
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
+    archive_months = _shared(
+        'archive-months', lambda: list(ArchiveMonth.objects.filter(count__gt=0)), ttl=600, key=list_key(Article),
+    )
+
+    context = {
+        'year': year,
+        'month': month,
+        'period_start': start,
+        'articles': articles,
+        'archive_months': archive_months,
+        'popular_posts': popular_posts,
+        'categories': categories,
+    }
+    response = render(request, 'archive_articles.html', context)
+    return add_surrogate_keys(response, *_page_keys(popular_posts, list_key(Article)))
 
 
 # 🔍 Search View
+@cache_policy(max_age=0, s_maxage=120)
+@query_budget(max_queries=6, max_db_ms=500)
 def search_view(request):
     query = request.GET.get('q', '')
     articles = []
@@ -193,10 +334,10 @@ def search_view(request):
         ) | Article.objects.filter(
             content__icontains=query
         )
-        articles = articles.order_by('-published_at').distinct()
+        articles = articles.select_related('category').prefetch_related('images').order_by('-published_at').distinct()
     
-    popular_posts = Article.objects.order_by('-views')[:4]
-    categories = Category.objects.all()
+    popular_posts = _popular_posts()
+    categories = _nav_categories()
     
     context = {
         'query': query,
@@ -204,4 +345,22 @@ def search_view(request):
         'popular_posts': popular_posts,
         'categories': categories,
     }
-    return render(request, 'search_results.html', context)
\ No newline at end of file
+    response = render(request, 'search_results.html', context)
+    return add_surrogate_keys(response, *_page_keys(popular_posts, list_key(Article)))
+
+
+# 💡 Search suggestions (search-as-you-type, served from the in-memory index)
+@cache_policy(max_age=60, s_maxage=300)
+@query_budget(max_queries=5, max_db_ms=200)
+def search_suggestions_view(request):
+    response = JsonResponse({'results': suggest.suggestions(request.GET.get('q', ''))})
+    return add_surrogate_keys(response, suggest.SURROGATE_KEY)
+
+
+# 📊 Rate limit counters (staff only, for monitoring)
+@staff_member_required
+def rate_limit_status_view(request):
+    return JsonResponse({
+        'counters': ratelimit.stats(),
+        'in_flight': ratelimit.RateLimitMiddleware.concurrency.snapshot(),
+    })
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pezawebsite.settings')
 
 application = get_asgi_application()
+
+from core.preload import early_hints  # noqa: E402  (needs the app registry set up above)
+
+application = early_hints(application)
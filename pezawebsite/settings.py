@@ -44,12 +44,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.page_cache.PageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
+    'core.preload.PreloadLinkMiddleware',
 ]
 
 ROOT_URLCONF = 'pezawebsite.urls'
@@ -84,6 +87,30 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/ref/settings/#caches
+# The object, page and fragment caches, the suggestion index version and the
+# single-flight locks live here, and the job worker and management commands
+# invalidate them, so every process must see the same cache. Set REDIS_URL in
+# production; the file cache is only shared by processes on one machine.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -132,3 +159,129 @@ MEDIA_ROOT = BASE_DIR / "media/"
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Background jobs (core/jobs.py, run with `manage.py run_worker`)
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 10  # seconds, doubled on each failed attempt
+JOBS_RETRY_BACKOFF_MAX = 3600
+JOBS_VISIBILITY_TIMEOUT = 300  # seconds before an unfinished job is retried
+JOBS_CONCURRENCY = 2  # default for run_worker; always 1 on SQLite
+JOBS_RETENTION_DAYS = {'done': 7, 'failed': 30}  # None keeps them forever
+JOBS_CLEANUP_INTERVAL = 3600  # seconds between deletions of finished jobs by the worker
+
+# Front-end HTTP cache (core/surrogate.py). Responses are tagged with surrogate
+# keys and purged by key when content changes. Use 'core.surrogate.HttpPurger'
+# with SURROGATE_PURGE_URL to purge a real proxy.
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+SURROGATE_PURGER = 'core.surrogate.LogPurger'
+SURROGATE_PURGE_URL = os.environ.get('SURROGATE_PURGE_URL', '')
+SURROGATE_PURGE_HEADERS = {}  # e.g. an auth header for the purge endpoint
+
+# Link previews for tool/resource URLs (core/link_previews.py), refreshed with
+# `manage.py refresh_link_previews`
+LINK_PREVIEW_TTL = 24 * 3600
+LINK_PREVIEW_ERROR_TTL = 3600
+LINK_PREVIEW_TIMEOUT = 10
+LINK_PREVIEW_WORKERS = 8
+LINK_PREVIEW_HOST_INTERVAL = 1.0  # seconds between requests to the same host
+
+# Rate limiting and load shedding per URL name (core/ratelimit.py).
+# Rates are tokens per second; 'memory' buckets are per process, 'cache'
+# buckets are shared through RATE_LIMIT_CACHE_ALIAS.
+RATE_LIMIT_BACKEND = 'memory'
+RATE_LIMIT_CACHE_ALIAS = 'default'
+RATE_LIMIT_TRUST_FORWARDED = False  # set True behind the caching proxy
+RATE_LIMITS = {
+    'search': {'rate': 0.5, 'burst': 10, 'global_rate': 20, 'global_burst': 40, 'max_concurrent': 4},
+    'search_suggestions': {'rate': 5, 'burst': 30},
+    'articles_by_tag': {'rate': 1, 'burst': 20, 'global_rate': 50, 'global_burst': 100, 'max_concurrent': 8},
+    'articles_by_category': {'rate': 1, 'burst': 20, 'global_rate': 50, 'global_burst': 100, 'max_concurrent': 8},
+    'article_archive_year': {'rate': 1, 'burst': 20, 'max_concurrent': 8},
+    'article_archive_month': {'rate': 1, 'burst': 20, 'max_concurrent': 8},
+}
+
+# Per-view query budgets (core/query_budget.py). Over-budget views raise when
+# QUERY_BUDGET_RAISE is on and are logged with their queries otherwise.
+QUERY_BUDGET_ENABLED = True
+QUERY_BUDGET_RAISE = DEBUG
+QUERY_BUDGET_CAPTURE_STACKS = True
+
+# View analytics (core/analytics.py). Views of articles, categories and tags
+# are buffered per process and flushed in one upsert; `manage.py
+# rollup_analytics` builds weekly and monthly stats. Day rows must be kept for
+# at least 31 days.
+ANALYTICS_FLUSH_SIZE = 100  # distinct rows (article, category or tag per day)
+ANALYTICS_FLUSH_INTERVAL = 30  # seconds
+ANALYTICS_RETENTION_DAYS = {'day': 90, 'week': 730, 'month': None}
+
+# Read-through cache of detail-page objects by slug (core/object_cache.py):
+# an in-process LRU in front of the shared cache, with negative caching.
+OBJECT_CACHE_ENABLED = True
+OBJECT_CACHE_ALIAS = 'default'
+OBJECT_CACHE_TTL = 600
+OBJECT_CACHE_NEGATIVE_TTL = 60
+OBJECT_CACHE_LOCAL_SIZE = 1000
+OBJECT_CACHE_LOCAL_TTL = 30  # bounds staleness after edits made by other processes
+
+# Critical third-party assets from base.html, sent as Link preload/preconnect
+# headers on every page and as 103 Early Hints under ASGI (core/preload.py)
+PRELOAD_LINKS = [
+    {'url': 'https://fonts.googleapis.com', 'rel': 'preconnect'},
+    {'url': 'https://fonts.gstatic.com', 'rel': 'preconnect', 'crossorigin': True},
+    {'url': 'https://fonts.cdnfonts.com', 'rel': 'preconnect', 'crossorigin': True},
+    {'url': 'https://cdn.tailwindcss.com', 'as_': 'script'},
+    {'url': 'https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&family=Roboto+Mono:wght@400;500&display=swap', 'as_': 'style'},
+    {'url': 'https://fonts.cdnfonts.com/css/maria-2', 'as_': 'style'},
+    {'url': 'https://unpkg.com/boxicons@2.1.4/css/boxicons.min.css', 'as_': 'style'},
+]
+# URL names of the HTML pages that get PRELOAD_LINKS as Early Hints; the API,
+# search suggestions, status endpoints and unknown URLs don't
+EARLY_HINT_URL_NAMES = [
+    'home', 'tutorials', 'blog', 'article_detail', 'tools', 'tool_detail', 'resources', 'resource_detail',
+    'articles_by_category', 'articles_by_tag', 'search', 'article_archive_year', 'article_archive_month',
+]
+
+# Save-time content rendering (core/content.py). Markdown content needs the
+# markdown package. Transforms run in order on the parsed HTML; re-run
+# `manage.py render_articles` after changing them.
+CONTENT_TRANSFORMS = [
+    'core.content.add_image_dimensions',
+    'core.content.resize_images',
+    'core.content.lazy_load_images',
+]
+CONTENT_EAGER_IMAGES = 1  # leading images left out of lazy loading
+CONTENT_IMAGE_RESIZE_URL = ''  # e.g. 'https://img.example.com/resize?w={width}&url={url}'
+CONTENT_IMAGE_MAX_WIDTH = 1200
+
+# Search-as-you-type suggestions (core/suggest.py), served from an in-process
+# index. Processes check the shared cache for content changes every
+# SUGGEST_VERSION_CHECK seconds.
+SUGGEST_MIN_LENGTH = 2
+SUGGEST_LIMIT = 8
+SUGGEST_VERSION_CHECK = 5
+
+# Cold start (core/startup.py, `manage.py profile_startup`). The test suite
+# fails when django.setup() in a fresh process takes longer than the budget or
+# imports any of the packages that should only load on first use.
+STARTUP_TIME_BUDGET = 1.5  # seconds
+STARTUP_LAZY_MODULES = ['bs4', 'requests', 'urllib3', 'markdown', 'brotli', 'PIL']
+
+# Full-page cache for anonymous requests (core/page_cache.py). Pages marked
+# public by cache_policy are stored with gzip and, when the optional brotli
+# package is installed, brotli bodies, and dropped when one of their
+# surrogate keys is purged.
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TTL = 600  # for pages without s-maxage or max-age in their Cache-Control
+PAGE_CACHE_STALE_TTL = 600  # served stale for this long while one request re-renders
+PAGE_CACHE_EXCLUDE_PREFIXES = ['/admin/', '/status/']
+PAGE_CACHE_MIN_COMPRESS = 200  # bytes; smaller bodies are only stored uncompressed
+PAGE_CACHE_MAX_VARIANTS = 16  # per URL, for responses with a Vary header
+
+# Cache stampede protection (core/single_flight.py). One request regenerates
+# an expired value while the others get the stale one; values are refreshed
+# early with a probability that grows as they near expiry (BETA > 1 earlier).
+SINGLE_FLIGHT_CACHE_ALIAS = 'default'
+SINGLE_FLIGHT_LOCK_TTL = 30
+SINGLE_FLIGHT_WAIT = 5
+SINGLE_FLIGHT_BETA = 1.0